@@ -6,10 +6,14 @@
 #                                                                                                                      #
 # #################################################################################################################### #
 import os
+from array import array
 from socket import *
 import struct
 import time
 import select
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 
 # #################################################################################################################### #
@@ -100,6 +104,12 @@ class IcmpHelperLibrary:
         def getTtl(self):
             return self.__ttl
 
+        def getDestinationIpAddress(self):
+            return self.__destinationIpAddress
+
+        def getPacketBytes(self):
+            return b''.join([self.__header, self.__data])
+
         # ############################################################################################################ #
         # IcmpPacket Class Setters                                                                                     #
         #                                                                                                              #
@@ -112,7 +122,7 @@ class IcmpHelperLibrary:
 
             # Only attempt to get destination address if it is not whitespace
             if len(self.__icmpTarget.strip()) > 0:
-                self.__destinationIpAddress = gethostbyname(self.__icmpTarget.strip())
+                self.__destinationIpAddress = IcmpHelperLibrary.resolverCache.resolve(self.__icmpTarget)
 
         def setIcmpType(self, icmpType):
             self.__icmpType = icmpType
@@ -142,40 +152,35 @@ class IcmpHelperLibrary:
         def __recalculateChecksum(self):
             print("calculateChecksum Started...") if self.__DEBUG_IcmpPacket else 0
             packetAsByteData = b''.join([self.__header, self.__data])
-            checksum = 0
-
-            # This checksum function will work with pairs of values with two separate 16 bit segments. Any remaining
-            # 16 bit segment will be handled on the upper end of the 32 bit segment.
-            countTo = (len(packetAsByteData) // 2) * 2
-
-            # Calculate checksum for all paired segments
-            print(f'{"Count":10} {"Value":10} {"Sum":10}') if self.__DEBUG_IcmpPacket else 0
-            count = 0
-            while count < countTo:
-                thisVal = packetAsByteData[count + 1] * 256 + packetAsByteData[count]
-                checksum = checksum + thisVal
-                checksum = checksum & 0xffffffff        # Capture 16 bit checksum as 32 bit value
-                print(f'{count:10} {hex(thisVal):10} {hex(checksum):10}') if self.__DEBUG_IcmpPacket else 0
-                count = count + 2
-
-            # Calculate checksum for remaining segment (if there are any)
-            if countTo < len(packetAsByteData):
-                thisVal = packetAsByteData[len(packetAsByteData) - 1]
-                checksum = checksum + thisVal
-                checksum = checksum & 0xffffffff        # Capture as 32 bit value
-                print(count, "\t", hex(thisVal), "\t", hex(checksum)) if self.__DEBUG_IcmpPacket else 0
-
-            # Add 1's Complement Rotation to original checksum
-            checksum = (checksum >> 16) + (checksum & 0xffff)   # Rotate and add to base 16 bits
-            checksum = (checksum >> 16) + checksum              # Rotate and add
-
-            answer = ~checksum                  # Invert bits
-            answer = answer & 0xffff            # Trim to 16 bit value
-            answer = answer >> 8 | (answer << 8 & 0xff00)
+
+            # An odd trailing byte is summed as if followed by a zero byte
+            if len(packetAsByteData) % 2 == 1:
+                packetAsByteData += b'\x00'
+
+            # Sum all 16 bit words in one pass over an array instead of a byte pair at a time. The one's complement
+            # sum does not depend on byte order (RFC 1071), so the words are summed in native order and only the
+            # result is converted to network order.
+            checksum = sum(array('H', packetAsByteData))
+            checksum = self.__foldChecksum(checksum)
+
+            answer = ~checksum & 0xffff         # Invert bits and trim to 16 bit value
+            answer = struct.unpack("!H", struct.pack("=H", answer))[0]
             print("Checksum: ", hex(answer)) if self.__DEBUG_IcmpPacket else 0
 
             self.setPacketChecksum(answer)
 
+        def __foldChecksum(self, checksum):
+            # Add 1's Complement Rotation until the carries are folded into 16 bits
+            while checksum >> 16:
+                checksum = (checksum >> 16) + (checksum & 0xffff)
+            return checksum
+
+        def __updateChecksum(self, oldWords, newWords):
+            # Incremental update for changed 16 bit words (network order), RFC 1624 eqn. 3: HC' = ~(~HC + ~m + m')
+            # (~m is 0xffff - m for a 16 bit word, so the complements of all old words are summed at once)
+            checksum = (~self.getPacketChecksum() & 0xffff) + 0xffff * len(oldWords) - sum(oldWords) + sum(newWords)
+            self.setPacketChecksum(~self.__foldChecksum(checksum) & 0xffff)
+
         def __packHeader(self):
             # The following header is based on http://www.networksorcery.com/enp/protocol/icmp/msg8.htm
             # Type = 8 bits
@@ -267,6 +272,18 @@ class IcmpHelperLibrary:
             self.__dataRaw = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
             self.__packAndRecalculateChecksum()
 
+        def updatePacket_echoRequest(self, packetSequenceNumber):
+            # Reuses a built echo request for the next probe: only the sequence number and the timestamp change, so
+            # the checksum is updated from those words instead of summing the whole packet again
+            newTime = struct.pack("d", time.time())
+            oldWords = (self.getPacketSequenceNumber(),) + struct.unpack("!4H", self.__data[:8])
+            newWords = (packetSequenceNumber,) + struct.unpack("!4H", newTime)
+
+            self.setPacketSequenceNumber(packetSequenceNumber)
+            self.__data = newTime + self.__data[8:]
+            self.__updateChecksum(oldWords, newWords)
+            self.__packHeader()
+
         def sendEchoRequest(self):
             if len(self.__icmpTarget.strip()) <= 0 | len(self.__destinationIpAddress.strip()) <= 0:
                 self.setIcmpTarget("127.0.0.1")
@@ -548,6 +565,329 @@ class IcmpHelperLibrary:
                     print("      Expected Data: %s, Actual Data: %s" %
                         (self.expectedData, self.getIcmpData()))
 
+    # ################################################################################################################ #
+    # Class IcmpReplyDispatcher                                                                                        #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Sends echo requests on one non-blocking raw socket registered with an asyncio event loop. Every probe gets a     #
+    # future; the loop calls the dispatcher when the socket is readable, and it resolves the future of the probe each  #
+    # reply answers, keyed by (identifier, sequence). Any number of probes can be in flight on one loop.               #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    class IcmpReplyDispatcher:
+        # ############################################################################################################ #
+        # IcmpReplyDispatcher Class Scope Variables                                                                    #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        __loop = None
+        __socket = None
+        __decodeReply = None            # Returns (type, code, identifier, sequence) of a received packet, or None
+        __pending = None                # (identifier, sequence) -> (future, time sent)
+        __icmpPacket = None             # Echo request reused for every probe with the same identifier
+        __closer = None                 # Task that closes the dispatcher when its loop shuts down
+
+        # ############################################################################################################ #
+        # IcmpReplyDispatcher Constructors                                                                             #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        def __init__(self, loop, decodeReply):
+            self.__loop = loop
+            self.__decodeReply = decodeReply
+            self.__pending = {}
+            self.__socket = socket(AF_INET, SOCK_RAW, IPPROTO_ICMP)
+            self.__socket.bind(("", 0))
+            self.__socket.setsockopt(SOL_SOCKET, SO_RCVBUF, 1 << 20)
+            self.__socket.setblocking(False)
+            loop.add_reader(self.__socket.fileno(), self.__readReplies)
+            self.__closer = loop.create_task(self.__closeWithLoop())
+
+        # ############################################################################################################ #
+        # IcmpReplyDispatcher Getters                                                                                  #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        def getLoop(self):
+            return self.__loop
+
+        def getPendingCount(self):
+            return len(self.__pending)
+
+        def isClosed(self):
+            return self.__socket is None
+
+        # ############################################################################################################ #
+        # IcmpReplyDispatcher Private Functions                                                                        #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        def __readReplies(self):
+            # Called by the event loop whenever the socket is readable; drains every reply that has arrived
+            while True:
+                try:
+                    recvPacket, addr = self.__socket.recvfrom(1024)
+                except (BlockingIOError, InterruptedError):
+                    return
+                timeReceived = time.time()
+                reply = self.__decodeReply(recvPacket)
+                if reply is None:
+                    continue
+                icmpType, icmpCode, identifier, sequence = reply
+                probe = self.__pending.pop((identifier, sequence), None)
+                if probe is None:
+                    continue
+                future, timeSent = probe
+                if not future.done():
+                    future.set_result((icmpType, icmpCode, addr[0], (timeReceived - timeSent) * 1000))
+
+        async def __closeWithLoop(self):
+            # Waits for good; asyncio.run() cancels every remaining task before it closes the loop, so the socket
+            # does not outlive the loop even when closeReplyDispatcher() is never called
+            try:
+                await self.__loop.create_future()
+            finally:
+                self.close()
+
+        def __expireProbe(self, key, future):
+            if key in self.__pending and self.__pending[key][0] is future:
+                del self.__pending[key]
+            if not future.done():
+                future.set_result(None)
+
+        # ############################################################################################################ #
+        # IcmpReplyDispatcher Public Functions                                                                         #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        def sendProbe(self, destinationIp, ttl, identifier, sequence, timeout):
+            # Returns a future resolved with (type, code, address, RTT in ms) of the reply, or None after timeout
+            # seconds without one. If the probe cannot be sent the future fails with the OSError, and only that probe
+            if self.__icmpPacket is None or self.__icmpPacket.getPacketIdentifier() != identifier:
+                self.__icmpPacket = IcmpHelperLibrary.IcmpPacket()
+                self.__icmpPacket.buildPacket_echoRequest(identifier, sequence)
+            else:
+                self.__icmpPacket.updatePacket_echoRequest(sequence)
+
+            future = self.__loop.create_future()
+            key = (identifier, sequence)
+            try:
+                self.__socket.setsockopt(IPPROTO_IP, IP_TTL, struct.pack('I', ttl))
+                self.__socket.sendto(self.__icmpPacket.getPacketBytes(), (destinationIp, 0))
+            except BlockingIOError:
+                future.set_result(None)             # Full send buffer: the probe is lost
+                return future
+            except OSError as error:
+                future.set_exception(error)         # e.g. network unreachable
+                return future
+            self.__pending[key] = (future, time.time())
+            timer = self.__loop.call_later(timeout, self.__expireProbe, key, future)
+            future.add_done_callback(lambda done: timer.cancel())
+            return future
+
+        def close(self):
+            if self.__socket is None:
+                return
+            self.__loop.remove_reader(self.__socket.fileno())
+            self.__socket.close()
+            self.__socket = None
+            if self.__closer is not asyncio.current_task(self.__loop):
+                self.__closer.cancel()
+            for future, timeSent in self.__pending.values():
+                if not future.done():
+                    future.set_result(None)
+            self.__pending.clear()
+
+    # ################################################################################################################ #
+    # Class IcmpResolverCache                                                                                          #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Caches host name lookups so a ping or traceroute resolves its target once instead of once per packet. Addresses  #
+    # are kept for positiveTtl seconds and failed lookups for negativeTtl seconds (the system resolver does not report #
+    # record TTLs, so both are fixed). resolveAll() looks up a whole target list on a thread pool up front, and        #
+    # resolveAsync() shares one lookup between all coroutines waiting for the same name.                               #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    class IcmpResolverCache:
+        # ############################################################################################################ #
+        # IcmpResolverCache Class Scope Variables                                                                      #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        __positiveTtl = 300.0           # Seconds an address stays cached
+        __negativeTtl = 30.0            # Seconds a failed lookup stays cached
+        __entries = None                # host -> (address or None, expiry time, error arguments)
+        __inFlight = None               # host -> future of the running asynchronous lookup
+        __hitCount = 0
+        __missCount = 0
+
+        # ############################################################################################################ #
+        # IcmpResolverCache Constructors                                                                               #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        def __init__(self, positiveTtl=300.0, negativeTtl=30.0):
+            self.__positiveTtl = positiveTtl
+            self.__negativeTtl = negativeTtl
+            self.__entries = {}
+            self.__inFlight = {}
+
+        # ############################################################################################################ #
+        # IcmpResolverCache Getters                                                                                    #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        def getHitCount(self):
+            return self.__hitCount
+
+        def getMissCount(self):
+            return self.__missCount
+
+        # ############################################################################################################ #
+        # IcmpResolverCache Setters                                                                                    #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        def setTtl(self, positiveTtl, negativeTtl):
+            self.__positiveTtl = positiveTtl
+            self.__negativeTtl = negativeTtl
+
+        # ############################################################################################################ #
+        # IcmpResolverCache Private Functions                                                                          #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        def __lookupCache(self, host):
+            # Returns the cached (address, error arguments) of host, or None if it is not cached or has expired.
+            # Dotted-quad addresses need no lookup and are returned as they are.
+            try:
+                inet_pton(AF_INET, host)
+                return host, None
+            except (OSError, ValueError):
+                pass
+            entry = self.__entries.get(host)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            self.__hitCount += 1
+            return entry[0], entry[2]
+
+        def __store(self, host, address, errorArguments):
+            ttl = self.__positiveTtl if address is not None else self.__negativeTtl
+            self.__entries[host] = (address, time.monotonic() + ttl, errorArguments)
+            return address, errorArguments
+
+        def __lookupResolver(self, host):
+            self.__missCount += 1
+            # Every failure is cached and later raised as gaierror, so one bad name never aborts a whole list
+            try:
+                return self.__store(host, gethostbyname(host), None)
+            except gaierror as e:
+                return self.__store(host, None, e.args)
+            except (UnicodeError, TypeError) as e:
+                # IDNA encoding fails on a label over 63 characters, and a NUL byte is rejected outright
+                return self.__store(host, None, (EAI_NONAME, f"Invalid host name ({e})"))
+            except OSError as e:
+                return self.__store(host, None, (EAI_FAIL, e.strerror or str(e)))
+
+        def __toAddress(self, result):
+            address, errorArguments = result
+            if address is None:
+                raise gaierror(*errorArguments)
+            return address
+
+        # ############################################################################################################ #
+        # IcmpResolverCache Public Functions                                                                           #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        #                                                                                                              #
+        # ############################################################################################################ #
+        def resolve(self, host):
+            # Returns the IPv4 address of host; raises gaierror if it cannot be resolved
+            host = host.strip()
+            result = self.__lookupCache(host)
+            if result is None:
+                result = self.__lookupResolver(host)
+            return self.__toAddress(result)
+
+        def resolveAll(self, hosts, workers=32, errors=None):
+            # Returns {host: address or None}, looking up every uncached name concurrently. If errors is a dict, the
+            # reason each unresolved host failed is added to it as {host: message}
+            names = {host: host.strip() for host in hosts}
+            results = {}
+            for name in set(names.values()):
+                result = self.__lookupCache(name)
+                if result is not None:
+                    results[name] = result
+            misses = [name for name in set(names.values()) if name not in results]
+            if misses:
+                with ThreadPoolExecutor(max_workers=min(workers, len(misses))) as pool:
+                    results.update(zip(misses, pool.map(self.__lookupResolver, misses)))
+            if errors is not None:
+                for host, name in names.items():
+                    address, errorArguments = results[name]
+                    if address is None:
+                        errors[host] = errorArguments[-1]
+            return {host: results[name][0] for host, name in names.items()}
+
+        async def resolveAsync(self, host):
+            # Like resolve(), but looks the name up in the event loop's executor
+            host = host.strip()
+            result = self.__lookupCache(host)
+            if result is not None:
+                return self.__toAddress(result)
+
+            future = self.__inFlight.get(host)
+            if future is None:
+                future = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(
+                    None, self.__lookupResolver, host))
+                self.__inFlight[host] = future
+                future.add_done_callback(lambda done: self.__inFlight.pop(host, None))
+            return self.__toAddress(await asyncio.shield(future))
+
+        def clear(self):
+            self.__entries.clear()
+
     # ################################################################################################################ #
     # Class IcmpHelperLibrary                                                                                          #
     #                                                                                                                  #
@@ -564,6 +904,10 @@ class IcmpHelperLibrary:
     #                                                                                                                  #
     # ################################################################################################################ #
     __DEBUG_IcmpHelperLibrary = False                  # Allows for debug output
+    __pingSocket = None                                # Raw socket shared by bulk pings, opened on first use
+    __nextSequenceNumber = 0                           # Next bulk ping sequence number (16 bits, wraps around)
+    __replyDispatcher = None                           # IcmpReplyDispatcher of the running event loop
+    resolverCache = IcmpResolverCache()                # Host name cache shared by all pings and traceroutes
 
     # ################################################################################################################ #
     # IcmpHelperLibrary Private Functions                                                                              #
@@ -627,9 +971,9 @@ class IcmpHelperLibrary:
 
         # Check host
         try:
-            destinationIp = gethostbyname(host.strip())
-        except gaierror:
-            print(f"Cannot resolve '{host}': Unknown host")
+            destinationIp = self.resolverCache.resolve(host)
+        except gaierror as e:
+            print(f"Cannot resolve '{host}': {e.args[-1]}")
             return
 
         print(f"Tracing route to {host} [{destinationIp}].\n")
@@ -708,6 +1052,305 @@ class IcmpHelperLibrary:
         except KeyboardInterrupt:
             print("\nTrace stopped by user.")
 
+    def __decodeIcmpReply(self, recvPacket):
+        # Returns (type, code, identifier, sequence) of the echo request a received packet answers, or None.
+        # Echo Replies carry the identifier and sequence number in their own header. Time Exceeded and Destination
+        # Unreachable messages quote the IP header and first 8 bytes of the original datagram, i.e. the ICMP header of
+        # our echo request, after their own 8 byte header (RFC 792).
+        ipHeaderLength = (recvPacket[0] & 0x0f) * 4
+        if len(recvPacket) < ipHeaderLength + 8:
+            return None
+        icmpType, icmpCode = recvPacket[ipHeaderLength:ipHeaderLength + 2]
+
+        if icmpType == 0:                               # Echo Reply
+            icmpHeaderStart = ipHeaderLength
+        elif icmpType == 11 or icmpType == 3:           # Time Exceeded / Destination Unreachable
+            quotedIpStart = ipHeaderLength + 8
+            if len(recvPacket) < quotedIpStart + 20 or recvPacket[quotedIpStart + 9] != IPPROTO_ICMP:
+                return None
+            icmpHeaderStart = quotedIpStart + (recvPacket[quotedIpStart] & 0x0f) * 4
+            if len(recvPacket) < icmpHeaderStart + 8 or recvPacket[icmpHeaderStart] != 8:
+                return None                             # quoted datagram is not an echo request
+        else:
+            return None
+
+        identifier, sequence = struct.unpack("!HH", recvPacket[icmpHeaderStart + 4:icmpHeaderStart + 8])
+        return icmpType, icmpCode, identifier, sequence
+
+    def __sendIcmpTraceRouteConcurrent(self, host, maxHops, timeout):
+        # Sends the probes for every TTL at once on one raw socket, using the TTL as the sequence number, and matches
+        # each reply to its probe through the echo request quoted in it. The whole path takes about one RTT plus the
+        # timeout instead of up to one timeout per hop.
+        try:
+            destinationIp = self.resolverCache.resolve(host)
+        except gaierror as e:
+            print(f"Cannot resolve '{host}': {e.args[-1]}")
+            return
+
+        print(f"Tracing route to {host} [{destinationIp}], {maxHops} hops probed in parallel.\n")
+
+        identifier = os.getpid() & 0xffff
+        sendTimes = {}          # TTL (= sequence number) -> time the probe was sent
+        hops = {}               # TTL -> (RTT in ms, ICMP type, ICMP code, responding address)
+        lastTtl = maxHops       # lowest TTL answered by something other than Time Exceeded
+
+        mySocket = socket(AF_INET, SOCK_RAW, IPPROTO_ICMP)
+        try:
+            mySocket.bind(("", 0))
+            icmpPacket = IcmpHelperLibrary.IcmpPacket()
+            icmpPacket.buildPacket_echoRequest(identifier, 1)
+            for ttl in range(1, maxHops + 1):
+                if ttl > 1:
+                    icmpPacket.updatePacket_echoRequest(ttl)
+                mySocket.setsockopt(IPPROTO_IP, IP_TTL, struct.pack('I', ttl))
+                sendTimes[ttl] = time.time()
+                mySocket.sendto(icmpPacket.getPacketBytes(), (destinationIp, 0))
+
+            # Wait for replies until every hop up to the destination has answered or the timeout runs out
+            deadline = time.time() + timeout
+            while any(ttl not in hops for ttl in range(1, lastTtl + 1)):
+                timeLeft = deadline - time.time()
+                if timeLeft <= 0:
+                    break
+                ready = select.select([mySocket], [], [], timeLeft)
+                if ready[0] == []:
+                    break
+                recvPacket, addr = mySocket.recvfrom(1024)
+                timeReceived = time.time()
+
+                reply = self.__decodeIcmpReply(recvPacket)
+                if reply is None:
+                    continue
+                icmpType, icmpCode, replyIdentifier, ttl = reply
+                if replyIdentifier != identifier or ttl not in sendTimes or ttl in hops:
+                    continue
+                hops[ttl] = ((timeReceived - sendTimes[ttl]) * 1000, icmpType, icmpCode, addr[0])
+                if icmpType != 11:
+                    lastTtl = min(lastTtl, ttl)
+        except OSError as e:
+            print(f"Failed to send ICMP packet: {e}")
+            return
+        # ctrl c exit
+        except KeyboardInterrupt:
+            print("\nTrace stopped by user.")
+        finally:
+            mySocket.close()
+
+        self.__printTraceRouteHops(hops, lastTtl)
+
+    def __printTraceRouteHops(self, hops, lastTtl):
+        for ttl in range(1, lastTtl + 1):
+            if ttl not in hops:
+                print(f"TTL={ttl}\t*        Request timed out.")
+                continue
+            rtt_ms, icmpType, icmpCode, address = hops[ttl]
+            if icmpType == 0:
+                print(f"TTL={ttl}\tRTT={rtt_ms:.0f} ms\tType={icmpType}\tCode={icmpCode}\tDestination {address}")
+                print("\nTrace complete.")
+            elif icmpType == 11:
+                print(f"TTL={ttl}\tRTT={rtt_ms:.0f} ms\tType={icmpType}\tCode={icmpCode}\t(Time to Live exceeded in transit) {address}")
+            else:
+                print(f"TTL={ttl}\tRTT={rtt_ms:.0f} ms\tType={icmpType}\tCode={icmpCode}\t(Host Unreachable) {address}")
+                print("\nTrace ended: Destination unreachable.")
+
+    def __allocateSequenceNumber(self):
+        sequence = self.__nextSequenceNumber
+        self.__nextSequenceNumber = (sequence + 1) & 0xffff
+        return sequence
+
+    def __getPingSocket(self):
+        # One raw socket is kept open for all bulk pings instead of one per packet
+        if self.__pingSocket is None:
+            self.__pingSocket = socket(AF_INET, SOCK_RAW, IPPROTO_ICMP)
+            self.__pingSocket.bind(("", 0))
+            self.__pingSocket.setsockopt(SOL_SOCKET, SO_RCVBUF, 1 << 20)   # replies arrive in bursts
+            self.__pingSocket.setblocking(False)
+        return self.__pingSocket
+
+    def __sendIcmpEchoRequestBulk(self, hosts, count, rate, timeout):
+        # Pings every host count times over the shared socket. Probes go out round-robin (one per host per round) at
+        # rate packets per second; each gets its own sequence number, and replies are matched to their probe by
+        # (identifier, sequence). A probe without an Echo Reply within timeout seconds counts as lost, so a sweep
+        # takes about hosts * count / rate + timeout seconds.
+        print("sendIcmpEchoRequestBulk Started...") if self.__DEBUG_IcmpHelperLibrary else 0
+
+        identifier = os.getpid() & 0xffff
+        statistics = {}
+        destinations = []
+        errors = {}
+        addresses = self.resolverCache.resolveAll(hosts, errors=errors)     # Resolved up front, not between probes
+        for host in hosts:
+            statistics[host] = self.__createPingStatistics()
+            statistics[host]["ip"] = addresses[host]
+            if addresses[host] is not None:
+                destinations.append(host)
+            else:
+                print(f"Cannot resolve '{host}': {errors[host]}")
+
+        probes = [host for _ in range(count) for host in destinations]
+        pending = {}            # (identifier, sequence) -> (host, time sent)
+        sendOrder = deque()     # (key, probe) in the order sent, so the oldest probe is always at the head
+        mySocket = self.__getPingSocket()
+        icmpPacket = IcmpHelperLibrary.IcmpPacket()
+        icmpPacket.buildPacket_echoRequest(identifier, 0)
+        startTime = time.time()
+        sent = 0
+
+        while sent < len(probes) or pending:
+            now = time.time()
+
+            # Send every probe that is due at the configured rate
+            while sent < len(probes) and startTime + sent / rate <= now:
+                host = probes[sent]
+                sequence = self.__allocateSequenceNumber()
+                icmpPacket.updatePacket_echoRequest(sequence)
+                try:
+                    mySocket.sendto(icmpPacket.getPacketBytes(), (statistics[host]["ip"], 0))
+                    probe = (host, time.time())
+                    pending[(identifier, sequence)] = probe
+                    sendOrder.append(((identifier, sequence), probe))
+                except OSError:
+                    statistics[host]["errors"] += 1
+                statistics[host]["transmitted"] += 1
+                sent += 1
+
+            # Drop answered probes from the head, then expire the ones that have waited longer than the timeout. A
+            # head whose key maps to another probe is stale: its sequence number was reused after it was answered.
+            while sendOrder:
+                key, probe = sendOrder[0]
+                if pending.get(key) is probe:
+                    if now - probe[1] <= timeout:
+                        break
+                    del pending[key]
+                sendOrder.popleft()
+
+            if sent < len(probes):
+                waitTime = startTime + sent / rate - time.time()
+            elif sendOrder:
+                waitTime = sendOrder[0][1][1] + timeout - time.time()
+            else:
+                break
+            select.select([mySocket], [], [], max(waitTime, 0))
+
+            # Drain every reply that has arrived
+            while True:
+                try:
+                    recvPacket, addr = mySocket.recvfrom(1024)
+                except (BlockingIOError, InterruptedError):
+                    break
+                timeReceived = time.time()
+                reply = self.__decodeIcmpReply(recvPacket)
+                if reply is None:
+                    continue
+                icmpType, icmpCode, replyIdentifier, sequence = reply
+                probe = pending.pop((replyIdentifier, sequence), None)
+                if probe is None:
+                    continue
+                host, timeSent = probe
+                if icmpType == 0:
+                    statistics[host]["received"] += 1
+                    statistics[host]["rtts"].append((timeReceived - timeSent) * 1000)
+                else:
+                    statistics[host]["errors"] += 1     # Time Exceeded / Destination Unreachable
+
+        for hostStatistics in statistics.values():
+            self.__summarizePingStatistics(hostStatistics)
+        return statistics
+
+    def __createPingStatistics(self):
+        return {"ip": None, "transmitted": 0, "received": 0, "errors": 0, "rtts": []}
+
+    def __summarizePingStatistics(self, hostStatistics):
+        # Calculates the statistics for RTT and packet loss
+        rtt_list = hostStatistics.pop("rtts")
+        transmitted = hostStatistics["transmitted"]
+        if transmitted > 0:
+            hostStatistics["loss"] = ((transmitted - hostStatistics["received"]) / transmitted) * 100
+        else:
+            hostStatistics["loss"] = 100.0
+        hostStatistics["min"] = min(rtt_list) if rtt_list else None
+        hostStatistics["avg"] = sum(rtt_list) / len(rtt_list) if rtt_list else None
+        hostStatistics["max"] = max(rtt_list) if rtt_list else None
+
+    def __printPingStatistics(self, statistics):
+        print("\n---- Ping statistics ----")
+        for host, hostStatistics in statistics.items():
+            if hostStatistics["ip"] is None:
+                continue
+            print("%s [%s]: %d packets transmitted, %d packets received, %.1f%% packet loss" %
+                  (host, hostStatistics["ip"], hostStatistics["transmitted"], hostStatistics["received"],
+                   hostStatistics["loss"]))
+            if hostStatistics["received"] > 0:
+                print("    round-trip min/avg/max = %.0f/%.0f/%.0f ms" %
+                      (hostStatistics["min"], hostStatistics["avg"], hostStatistics["max"]))
+
+    def __getReplyDispatcher(self):
+        # One dispatcher (and raw socket) per event loop, created on first use
+        loop = asyncio.get_running_loop()
+        if (self.__replyDispatcher is None or self.__replyDispatcher.isClosed()
+                or self.__replyDispatcher.getLoop() is not loop):
+            if self.__replyDispatcher is not None:
+                self.__replyDispatcher.close()
+            self.__replyDispatcher = IcmpHelperLibrary.IcmpReplyDispatcher(loop, self.__decodeIcmpReply)
+        return self.__replyDispatcher
+
+    async def __resolveHostAsync(self, host):
+        # Resolves in the loop's executor so the lookup does not block other probes
+        try:
+            return await self.resolverCache.resolveAsync(host)
+        except gaierror as e:
+            print(f"Cannot resolve '{host}': {e.args[-1]}")
+            return None
+
+    async def __sendIcmpEchoRequestAsync(self, host, count, timeout):
+        hostStatistics = self.__createPingStatistics()
+        hostStatistics["ip"] = await self.__resolveHostAsync(host)
+        if hostStatistics["ip"] is not None:
+            dispatcher = self.__getReplyDispatcher()
+            identifier = os.getpid() & 0xffff
+            for i in range(count):
+                hostStatistics["transmitted"] += 1
+                try:
+                    reply = await dispatcher.sendProbe(hostStatistics["ip"], 255, identifier,
+                                                       self.__allocateSequenceNumber(), timeout)
+                except OSError:
+                    hostStatistics["errors"] += 1
+                    continue
+                if reply is None:
+                    continue
+                icmpType, icmpCode, address, rtt_ms = reply
+                if icmpType == 0:
+                    hostStatistics["received"] += 1
+                    hostStatistics["rtts"].append(rtt_ms)
+                else:
+                    hostStatistics["errors"] += 1
+        self.__summarizePingStatistics(hostStatistics)
+        return hostStatistics
+
+    async def __sendIcmpTraceRouteAsync(self, host, maxHops, timeout):
+        destinationIp = await self.__resolveHostAsync(host)
+        if destinationIp is None:
+            return {}, 0
+        print(f"Tracing route to {host} [{destinationIp}], {maxHops} hops probed in parallel.\n")
+
+        # Every TTL is probed at once; the dispatcher matches replies through the quoted echo request
+        dispatcher = self.__getReplyDispatcher()
+        identifier = os.getpid() & 0xffff
+        replies = await asyncio.gather(*[dispatcher.sendProbe(destinationIp, ttl, identifier,
+                                                              self.__allocateSequenceNumber(), timeout)
+                                         for ttl in range(1, maxHops + 1)], return_exceptions=True)
+
+        hops = {}               # TTL -> (RTT in ms, ICMP type, ICMP code, responding address)
+        lastTtl = maxHops       # lowest TTL answered by something other than Time Exceeded
+        for ttl, reply in enumerate(replies, 1):
+            if reply is None or isinstance(reply, OSError):
+                continue
+            icmpType, icmpCode, address, rtt_ms = reply
+            hops[ttl] = (rtt_ms, icmpType, icmpCode, address)
+            if icmpType != 11:
+                lastTtl = min(lastTtl, ttl)
+        return {ttl: hop for ttl, hop in hops.items() if ttl <= lastTtl}, lastTtl
+
 
     # ################################################################################################################ #
     # IcmpHelperLibrary Public Functions                                                                               #
@@ -720,10 +1363,50 @@ class IcmpHelperLibrary:
         print("ping Started...") if self.__DEBUG_IcmpHelperLibrary else 0
         self.__sendIcmpEchoRequest(targetHost)
 
+    def sendPingBulk(self, targetHosts, count=4, rate=100.0, timeout=2.0):
+        # Returns {host: {"ip", "transmitted", "received", "errors", "loss", "min", "avg", "max"}}, RTTs in ms
+        print("pingBulk Started...") if self.__DEBUG_IcmpHelperLibrary else 0
+        statistics = self.__sendIcmpEchoRequestBulk(targetHosts, count, rate, timeout)
+        self.__printPingStatistics(statistics)
+        return statistics
+
+    def closePingSocket(self):
+        if self.__pingSocket is not None:
+            self.__pingSocket.close()
+            self.__pingSocket = None
+
     def traceRoute(self, targetHost):
         print("traceRoute Started...") if self.__DEBUG_IcmpHelperLibrary else 0
         self.__sendIcmpTraceRoute(targetHost)
 
+    def traceRouteConcurrent(self, targetHost, maxHops=30, timeout=2.0):
+        print("traceRouteConcurrent Started...") if self.__DEBUG_IcmpHelperLibrary else 0
+        self.__sendIcmpTraceRouteConcurrent(targetHost, maxHops, timeout)
+
+    async def sendPingAsync(self, targetHost, count=4, timeout=2.0):
+        # Coroutine version of sendPing for asyncio applications; returns the host's statistics as sendPingBulk does
+        print("sendPingAsync Started...") if self.__DEBUG_IcmpHelperLibrary else 0
+        hostStatistics = await self.__sendIcmpEchoRequestAsync(targetHost, count, timeout)
+        self.__printPingStatistics({targetHost: hostStatistics})
+        return hostStatistics
+
+    async def traceRouteAsync(self, targetHost, maxHops=30, timeout=2.0):
+        # Coroutine version of traceRoute; returns {TTL: (RTT in ms, type, code, address)} for the hops that answered
+        print("traceRouteAsync Started...") if self.__DEBUG_IcmpHelperLibrary else 0
+        hops, lastTtl = await self.__sendIcmpTraceRouteAsync(targetHost, maxHops, timeout)
+        self.__printTraceRouteHops(hops, lastTtl)
+        return hops
+
+    def resolveTargets(self, targetHosts, errors=None):
+        # Resolves a target list ahead of a sweep; returns {host: address or None} and, if errors is a dict, fills it
+        # with {host: reason} for the hosts that could not be resolved
+        return self.resolverCache.resolveAll(targetHosts, errors=errors)
+
+    def closeReplyDispatcher(self):
+        if self.__replyDispatcher is not None:
+            self.__replyDispatcher.close()
+            self.__replyDispatcher = None
+
 
 # #################################################################################################################### #
 # main()                                                                                                               #
@@ -740,6 +1423,7 @@ def main():
     # icmpHelperPing.sendPing("209.233.126.254")
     # icmpHelperPing.sendPing("www.google.com")
     # icmpHelperPing.sendPing("gaia.cs.umass.edu")
+    # icmpHelperPing.sendPingBulk(["www.google.com", "gaia.cs.umass.edu", "209.233.126.254"], count=4, rate=100)
     # icmpHelperPing.traceRoute("gaia.cs.umass.edu")
     # icmpHelperPing.traceRoute("164.151.129.20")
     # icmpHelperPing.traceRoute("122.56.99.243")
@@ -747,6 +1431,8 @@ def main():
     # icmpHelperPing.traceRoute("122.56.99.243") # type 11 and type 3 (1)
     # icmpHelperPing.traceRoute("200.10.277.250")
     # icmpHelperPing.traceRoute("www.cam.ac.uk") www.ui.ac.id
+    # icmpHelperPing.traceRouteConcurrent("www.ui.ac.id")
+    # asyncio.run(icmpHelperPing.traceRouteAsync("www.ui.ac.id"))
     icmpHelperPing.traceRoute("www.ui.ac.id")
 
 
@@ -0,0 +1,131 @@
+from collections import deque
+
+
+# #################################################################################################################### #
+# Channel models                                                                                                       #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Pluggable link behaviour for UnreliableChannel. A channel has up to three models, each replacing one of its fixed    #
+# impairments:                                                                                                         #
+#   LossModel      decides which transmitted segments are lost (instead of RATIO_DROPPED_PACKETS)                      #
+#   LinkModel      limits how many segments leave per iteration and queues the rest                                    #
+#   DelayModel     gives every delivered segment a latency in iterations                                               #
+#                                                                                                                      #
+# Notes:                                                                                                               #
+# Models draw from the channel's rng, so a seeded channel stays reproducible. Models keep state (the Gilbert-Elliott   #
+# channel state, the link queue), so each channel needs its own instances.                                             #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+
+class LossModel(object):
+    # Returns True if the segment transmitted now is lost.
+    def isLost(self, rng):
+        return False
+
+
+# #################################################################################################################### #
+# BernoulliLoss                                                                                                        #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Independent losses with a fixed probability, the channel's default behaviour                                         #
+#                                                                                                                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+
+class BernoulliLoss(LossModel):
+    def __init__(self, ratio):
+        self.ratio = ratio
+
+    def isLost(self, rng):
+        return rng.random() <= self.ratio
+
+
+# #################################################################################################################### #
+# GilbertElliottLoss                                                                                                   #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Two-state Markov chain: a good state with loss probability lossGood and a bad state with lossBad. Before each        #
+# segment the chain moves good -> bad with probability pGoodToBad and bad -> good with pBadToGood, so losses come in   #
+# bursts with a mean bad-state length of 1 / pBadToGood segments.                                                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+
+class GilbertElliottLoss(LossModel):
+    def __init__(self, pGoodToBad, pBadToGood, lossGood=0.0, lossBad=1.0):
+        self.pGoodToBad = pGoodToBad
+        self.pBadToGood = pBadToGood
+        self.lossGood = lossGood
+        self.lossBad = lossBad
+        self.bad = False
+
+    def isLost(self, rng):
+        if self.bad:
+            if rng.random() < self.pBadToGood:
+                self.bad = False
+        elif rng.random() < self.pGoodToBad:
+            self.bad = True
+        return rng.random() < (self.lossBad if self.bad else self.lossGood)
+
+    # Long-run fraction of segments lost
+    def getAverageLoss(self):
+        total = self.pGoodToBad + self.pBadToGood
+        if total == 0:
+            return self.lossBad if self.bad else self.lossGood
+        badShare = self.pGoodToBad / total
+        return badShare * self.lossBad + (1 - badShare) * self.lossGood
+
+
+# #################################################################################################################### #
+# LinkModel                                                                                                            #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Bandwidth cap with a drop-tail queue. Up to segmentsPerIteration segments leave per iteration, in FIFO order; the    #
+# rest wait in a queue of queueLimit segments, and segments arriving at a full queue are dropped.                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+
+class LinkModel(object):
+    def __init__(self, segmentsPerIteration, queueLimit):
+        self.segmentsPerIteration = segmentsPerIteration
+        self.queueLimit = queueLimit
+        self.queue = deque()
+
+    def __len__(self):
+        return len(self.queue)
+
+    # Queues seg; returns False (tail drop) if the queue is full.
+    def enqueue(self, seg):
+        if len(self.queue) >= self.queueLimit:
+            return False
+        self.queue.append(seg)
+        return True
+
+    # Returns the segments transmitted this iteration.
+    def dequeue(self):
+        count = min(self.segmentsPerIteration, len(self.queue))
+        return [self.queue.popleft() for _ in range(count)]
+
+
+# #################################################################################################################### #
+# DelayModel                                                                                                           #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Propagation delay with jitter: each segment takes iterations +/- jitter (uniform, at least 0) iterations to arrive.  #
+# Segments are delivered when they arrive, so jitter larger than the spacing between segments reorders them.           #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+
+class DelayModel(object):
+    def __init__(self, iterations, jitter=0):
+        self.iterations = iterations
+        self.jitter = jitter
+
+    def getDelay(self, rng):
+        if self.jitter == 0:
+            return self.iterations
+        return max(0, self.iterations + rng.randint(-self.jitter, self.jitter))
@@ -0,0 +1,85 @@
+import struct
+from collections import deque
+
+# #################################################################################################################### #
+# Channel traces                                                                                                       #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Record and replay of UnreliableChannel decisions. A recorder logs every reorder, delay, drop, corruption and         #
+# propagation-latency decision with the segment's seq/ack to a compact binary file; a replayer feeds the recorded      #
+# outcomes back to a later run, so an RDT change can be measured against exactly the same impairments.                 #
+#                                                                                                                      #
+# Notes:                                                                                                               #
+# File layout: the MAGIC header, then one RECORD per decision (iteration, kind, outcome, seq, ack; little endian).     #
+# Outcome is 0/1, or the latency in iterations for LATENCY. seq and ack are -1 when the segment has none (or for       #
+# REORDER, which applies to a whole iteration).                                                                        #
+# Replay hands out each kind's outcomes in recorded order. If the protocol sends more segments than the recorded run,  #
+# the channel falls back to its rng once a kind's outcomes run out; countExhausted counts those decisions and          #
+# rdt_batch.py reports them.                                                                                           #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+MAGIC = b'RDTTRC1\n'
+RECORD = struct.Struct('<IBHii')
+
+REORDER = 0
+DELAY = 1
+DROP = 2
+CORRUPT = 3
+LATENCY = 4
+
+KIND_NAMES = ['reorder', 'delay', 'drop', 'corrupt', 'latency']
+
+
+class TraceRecorder(object):
+    def __init__(self, path):
+        self.path = path
+        self.buffer = bytearray(MAGIC)
+        self.countRecords = 0
+
+    def record(self, iteration, kind, seg, outcome):
+        if seg is None:
+            seq = ack = -1
+        else:
+            seq = seg.seqnum
+            ack = seg.acknum
+        self.buffer += RECORD.pack(iteration, kind, int(outcome), seq, ack)
+        self.countRecords += 1
+
+    def close(self):
+        with open(self.path, 'wb') as traceFile:
+            traceFile.write(self.buffer)
+
+
+# #################################################################################################################### #
+# readTrace()                                                                                                          #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Returns a trace file's records as (iteration, kind, outcome, seq, ack) tuples                                        #
+#                                                                                                                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+def readTrace(path):
+    with open(path, 'rb') as traceFile:
+        data = traceFile.read()
+    if not data.startswith(MAGIC):
+        raise ValueError("{0} is not a channel trace".format(path))
+    return list(RECORD.iter_unpack(memoryview(data)[len(MAGIC):]))
+
+
+class TraceReplayer(object):
+    def __init__(self, path):
+        self.path = path
+        self.records = readTrace(path)
+        self.outcomes = [deque() for _ in KIND_NAMES]
+        for iteration, kind, outcome, seq, ack in self.records:
+            self.outcomes[kind].append(outcome)
+        self.countExhausted = 0     # decisions asked for after the kind's recorded outcomes ran out
+
+    # Returns the next recorded outcome of kind, or None once they are used up.
+    def nextOutcome(self, kind):
+        outcomes = self.outcomes[kind]
+        if outcomes:
+            return outcomes.popleft()
+        self.countExhausted += 1
+        return None
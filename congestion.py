@@ -0,0 +1,106 @@
+# #################################################################################################################### #
+# CongestionController                                                                                                 #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Pluggable congestion control for RDTLayer. A controller owns the congestion window (in characters of sequence        #
+# space) and updates it from ACK and timeout events. RDTLayer sends no more than min(congestion window, flow-control   #
+# window) of unacknowledged data.                                                                                      #
+#                                                                                                                      #
+# Notes:                                                                                                               #
+# New policies (Cubic, BBR, ...) subclass CongestionController and override the event handlers they care about. The    #
+# handlers receive the current iteration and the latest RTT sample so time- and delay-based policies can be built.     #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+
+class CongestionController(object):
+    def __init__(self, mss):
+        self.mss = mss
+        self.cwnd = mss
+
+    def getWindow(self):
+        return self.cwnd
+
+    def setMss(self, mss):
+        self.mss = mss
+
+    # Called for every ACK that releases data. bytesAcked covers cumulative and selective acknowledgment.
+    def onAck(self, bytesAcked, flightSize, currentIteration, rttSample):
+        pass
+
+    # Called once per retransmission timeout expiry.
+    def onTimeout(self, flightSize, currentIteration):
+        pass
+
+    # Called when duplicate ACKs trigger a fast retransmit; fast recovery starts.
+    def onFastRetransmit(self, flightSize, dupAcks, currentIteration):
+        pass
+
+    # Called for each further duplicate ACK during fast recovery.
+    def onRecoveryDupAck(self):
+        pass
+
+    # Called for an ACK that advances during fast recovery without covering everything outstanding at the loss.
+    def onPartialAck(self, bytesAcked):
+        pass
+
+    # Called when fast recovery ends with an ACK for everything outstanding at the loss.
+    def onRecoveryExit(self):
+        pass
+
+
+# #################################################################################################################### #
+# RenoController                                                                                                       #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Slow start with byte counting (RFC 3465), AIMD and fast recovery (RFC 5681, NewReno partial ACKs RFC 6582).          #
+#                                                                                                                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+
+class RenoController(CongestionController):
+    INITIAL_WINDOW_SEGMENTS = 2     # initial congestion window, in segments
+    MIN_SSTHRESH_SEGMENTS = 2       # lower bound for the slow start threshold, in segments
+    ABC_LIMIT_SEGMENTS = 2          # appropriate byte counting (RFC 3465): most slow start growth per ACK, in segments
+
+    def __init__(self, mss):
+        super().__init__(mss)
+        self.cwnd = RenoController.INITIAL_WINDOW_SEGMENTS * mss
+        self.ssthresh = float('inf')
+        self.windowMoved = False
+
+    def setMss(self, mss):
+        super().setMss(mss)
+        # until the first ACK or loss the initial window is counted in segments of the negotiated size
+        if not self.windowMoved:
+            self.cwnd = RenoController.INITIAL_WINDOW_SEGMENTS * mss
+
+    def onAck(self, bytesAcked, flightSize, currentIteration, rttSample):
+        self.windowMoved = True
+        if self.cwnd < self.ssthresh:
+            # slow start: grow by the bytes acknowledged, so a delayed or coalesced ACK counts every segment it covers
+            self.cwnd += min(bytesAcked, RenoController.ABC_LIMIT_SEGMENTS * self.mss)
+        else:
+            # congestion avoidance: grow by about one segment per window of acknowledged bytes
+            self.cwnd += max(1, self.mss * bytesAcked // self.cwnd)
+
+    def onTimeout(self, flightSize, currentIteration):
+        self.windowMoved = True
+        self.ssthresh = max(flightSize // 2, RenoController.MIN_SSTHRESH_SEGMENTS * self.mss)
+        self.cwnd = self.mss
+
+    def onFastRetransmit(self, flightSize, dupAcks, currentIteration):
+        self.windowMoved = True
+        self.ssthresh = max(flightSize // 2, RenoController.MIN_SSTHRESH_SEGMENTS * self.mss)
+        # each duplicate ACK means a segment has left the network
+        self.cwnd = self.ssthresh + dupAcks * self.mss
+
+    def onRecoveryDupAck(self):
+        self.cwnd += self.mss
+
+    def onPartialAck(self, bytesAcked):
+        self.cwnd = max(self.cwnd - bytesAcked + self.mss, self.mss)
+
+    def onRecoveryExit(self):
+        self.cwnd = self.ssthresh
@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import random
+import struct
+import sys
+
+from udp_channel import createLayer, decodeSegment, encodeSegment, isSendComplete
+
+# #################################################################################################################### #
+# asyncio driver                                                                                                       #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Runs RDTLayer from an asyncio event loop instead of the lockstep iteration loop. The layer's iteration becomes a     #
+# real clock (RESOLUTION seconds per iteration) and processData() runs only on events: a datagram arriving             #
+# (datagram_received), a loop timer armed for the layer's next deadline (retransmission, delayed ACK, probe), or new   #
+# data to send. ACKs therefore release new segments as soon as they arrive, and latency depends on the network         #
+# rather than on a polling tick. Any number of endpoints share one loop.                                               #
+#                                                                                                                      #
+# Notes:                                                                                                               #
+# Segments travel as udp_channel.py datagrams. An endpoint learns its peer from the first datagram when it is created  #
+# without a remote address.                                                                                            #
+#   python rdt_async.py --connections 8 --size 100000 --loss 0.05                                                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+RESOLUTION = 0.001          # seconds per layer iteration
+INITIAL_TIMEOUT = 200       # iterations (ms) before the first RTT sample
+MAX_TIMEOUT = 2000          # iterations (ms)
+MIN_TIMEOUT = 20            # iterations (ms), well above ACK_DELAY so a delayed ACK never looks like a loss
+ACK_DELAY = 2               # iterations (ms) an in-order segment may wait for the next one before it is acknowledged
+
+
+class AsyncRdtEndpoint(asyncio.DatagramProtocol):
+    def __init__(self, layer, remoteAddress=None, lossRatio=0.0, rng=None):
+        self.layer = layer
+        self.remoteAddress = remoteAddress
+        self.lossRatio = lossRatio          # outgoing datagrams dropped on purpose, for testing
+        self.rng = rng if rng is not None else random
+        self.transport = None
+        self.loop = None
+        self.startTime = 0.0
+        self.incoming = []
+        self.timer = None
+        self.progress = None                # set after every step, so waiters re-check their condition
+        self.countSentDatagrams = 0
+        self.countReceivedDatagrams = 0
+        layer.setSendChannel(self)
+        layer.setReceiveChannel(self)
+        layer.setTimeouts(INITIAL_TIMEOUT, MAX_TIMEOUT, MIN_TIMEOUT)
+        layer.setAckDelay(ACK_DELAY)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # channel interface used by RDTLayer
+
+    def send(self, seg):
+        if self.transport is None or self.remoteAddress is None:
+            return
+        if self.lossRatio and self.rng.random() < self.lossRatio:
+            return
+        self.transport.sendto(encodeSegment(seg), self.remoteAddress)
+        self.countSentDatagrams += 1
+
+    def receive(self):
+        segments = self.incoming
+        self.incoming = []
+        return segments
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # asyncio.DatagramProtocol
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+        self.startTime = self.loop.time()
+        self.progress = asyncio.Event()
+
+    def datagram_received(self, data, address):
+        if self.remoteAddress is None:
+            self.remoteAddress = address
+        try:
+            self.incoming.append(decodeSegment(data))
+        except (struct.error, UnicodeDecodeError):
+            return
+        self.countReceivedDatagrams += 1
+        self.step()
+
+    def error_received(self, exc):
+        pass        # e.g. ICMP port unreachable before the peer is up: a lost datagram
+
+    def connection_lost(self, exc):
+        if self.timer is not None:
+            self.timer.cancel()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+
+    def getIteration(self):
+        return int((self.loop.time() - self.startTime) / RESOLUTION)
+
+    # Runs the layer once at the current time and re-arms the loop timer for its next deadline
+    def step(self):
+        if self.transport is None:
+            return
+        now = self.getIteration()
+        self.layer.processData(now)
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        deadline = self.layer.getNextDeadline()
+        if deadline is not None:
+            # a deadline already due fires on the next iteration rather than spinning
+            delay = max(deadline - now, 1) * RESOLUTION
+            self.timer = self.loop.call_later(delay, self.step)
+
+        self.progress.set()
+        self.progress = asyncio.Event()
+
+    def setDataToSend(self, data):
+        self.layer.setDataToSend(data)
+        self.step()
+
+    async def waitUntil(self, condition):
+        while not condition():
+            await self.progress.wait()
+
+    async def waitSent(self):
+        await self.waitUntil(lambda: isSendComplete(self.layer))
+
+    async def waitReceived(self, length):
+        await self.waitUntil(lambda: len(self.layer.dataReceived) >= length)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+async def openEndpoint(localAddress, remoteAddress=None, mss=1024, window=65536, lossRatio=0.0, rng=None):
+    loop = asyncio.get_running_loop()
+    transport, endpoint = await loop.create_datagram_endpoint(
+        lambda: AsyncRdtEndpoint(createLayer(mss, window), remoteAddress, lossRatio, rng), local_addr=localAddress)
+    return endpoint
+
+
+# #################################################################################################################### #
+# transfer()                                                                                                           #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# One connection over localhost within the running loop: returns (elapsed seconds, data intact, sending endpoint)      #
+#                                                                                                                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+async def transfer(data, host, mss, window, lossRatio, seed):
+    rng = random.Random(seed)
+    receiver = await openEndpoint((host, 0), None, mss, window, lossRatio, rng)
+    sender = await openEndpoint((host, 0), receiver.transport.get_extra_info('sockname'), mss, window, lossRatio,
+                                rng)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    sender.setDataToSend(data)
+    await asyncio.gather(sender.waitSent(), receiver.waitReceived(len(data)))
+    elapsed = loop.time() - start
+    intact = bytes(receiver.layer.dataReceived) == data
+    sender.close()
+    receiver.close()
+    return elapsed, intact, sender
+
+
+async def runConnections(args):
+    rng = random.Random(args.seed)
+    payloads = [rng.randbytes(args.size) for _ in range(args.connections)]
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    results = await asyncio.gather(*[transfer(data, args.host, args.mss, args.window, args.loss,
+                                              None if args.seed is None else args.seed + index)
+                                     for index, data in enumerate(payloads)])
+    elapsed = loop.time() - start
+
+    for index, (connectionElapsed, intact, sender) in enumerate(results):
+        srtt = sender.layer.rttEstimator.srtt
+        print("Connection {0}: {1} bytes in {2:.3f} s, {3}, smoothed RTT {4} ms, timeouts {5}".format(
+            index, args.size, connectionElapsed, "intact" if intact else "CORRUPT",
+            "-" if srtt is None else "{0:.2f}".format(srtt * RESOLUTION * 1000), sender.layer.countSegmentTimeouts))
+    total = args.size * args.connections
+    print("Total: {0} bytes in {1:.3f} s ({2:.1f} KB/s)".format(total, elapsed, total / max(elapsed, 1e-9) / 1024))
+    return all(intact for connectionElapsed, intact, sender in results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RDT connections on an asyncio event loop")
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--size', type=int, default=100000, help="random bytes per connection")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--mss', type=int, default=1024)
+    parser.add_argument('--window', type=int, default=65536)
+    parser.add_argument('--loss', type=float, default=0.0, help="ratio of datagrams dropped on send")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+    sys.exit(0 if asyncio.run(runConnections(args)) else 1)
+
+
+if __name__ == '__main__':
+    main()
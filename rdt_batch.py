@@ -0,0 +1,276 @@
+import argparse
+import csv
+import itertools
+import json
+import random
+import sys
+
+from channel_models import DelayModel, GilbertElliottLoss, LinkModel
+from channel_trace import TraceRecorder, TraceReplayer
+from rdt_layer import RDTLayer
+from unreliable import UnreliableChannel
+
+# #################################################################################################################### #
+# Batch runner                                                                                                         #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Headless counterpart of rdt_main.py. Runs the client/server/channel loop to completion without console I/O for       #
+# every combination of the swept settings and writes one result row per run as CSV or JSON.                            #
+#                                                                                                                      #
+# Notes:                                                                                                               #
+# Each sweep argument takes a comma-separated list, e.g.                                                               #
+#   python rdt_batch.py --loss 0,0.1,0.2 --window 15,60 --mss 4,16 --runs 5 --output results.csv                       #
+# Goodput is delivered characters (bytes in binary mode) per iteration.                                                #
+# --gilbert-elliott, --bandwidth/--queue and --propagation-delay/--jitter apply channel_models to both channels for    #
+# every run; a Gilbert-Elliott loss model replaces the --loss ratio.                                                   #
+# --record-trace PREFIX writes each run's channel decisions to PREFIX[-run].c2s / .s2c (see channel_trace.py), and     #
+# --replay-trace PREFIX forces them on a later run; with --assert-max-iterations this makes a regression check:        #
+#   python rdt_batch.py --record-trace traces/base                                                                     #
+#   python rdt_batch.py --replay-trace traces/base --assert-max-iterations 450                                         #
+# exhaustedDecisions counts the decisions a replayed run needed beyond the recorded ones, which were drawn afresh; the #
+# check fails when it is not 0, since such a run no longer faces the recorded impairments.                             #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+DEFAULT_DATA = "The quick brown fox jumped over the lazy dog. " * 22
+MAX_ITERATIONS = 100000     # give up on a run that has not finished by then
+DEFAULT_QUEUE_SEGMENTS = 64 # drop-tail queue length of a bandwidth-limited link
+
+FIELDS = ['loss', 'delay', 'reorder', 'corruption', 'window', 'mss', 'seed',
+          'completed', 'iterations', 'packetsSent', 'dataPackets', 'ackPackets',
+          'timeouts', 'fastRetransmits', 'retransmits', 'spuriousRetransmits', 'goodput', 'exhaustedDecisions']
+
+
+# #################################################################################################################### #
+# runTransfer()                                                                                                        #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Sends data from a client to a server over two channels with the given impairment ratios and returns the run's        #
+# statistics as a dict keyed by FIELDS                                                                                 #
+#                                                                                                                      #
+# #################################################################################################################### #
+def runTransfer(data, loss, delay, reorder, corruption, window, mss, seed, maxIterations=MAX_ITERATIONS,
+                linkProfile=None, recordTrace=None, replayTrace=None, duplex=False):
+    # each channel draws from its own generator, seeded from the run's seed, so a run is reproducible on its own
+    seeds = random.Random(seed)
+
+    client = RDTLayer()
+    server = RDTLayer()
+    channels = []
+    for _ in range(2):
+        rng = random.Random(seeds.getrandbits(64))
+        channel = UnreliableChannel(reorder > 0, loss > 0, delay > 0, corruption > 0, rng)
+        channel.setRatioDroppedPackets(loss)
+        channel.setRatioDelayedPackets(delay)
+        channel.setRatioOutOfOrderPackets(reorder)
+        channel.setRatioDataErrorPackets(corruption)
+        if linkProfile:
+            applyLinkProfile(channel, linkProfile)
+        channels.append(channel)
+    clientToServerChannel, serverToClientChannel = channels
+    recorders = []
+    replayers = []
+    for channel, suffix in ((clientToServerChannel, '.c2s'), (serverToClientChannel, '.s2c')):
+        if recordTrace:
+            recorders.append(TraceRecorder(recordTrace + suffix))
+            channel.setTraceRecorder(recorders[-1])
+        if replayTrace:
+            replayers.append(TraceReplayer(replayTrace + suffix))
+            channel.setTraceReplayer(replayers[-1])
+
+    for layer in (client, server):
+        layer.setVerbose(False)
+        layer.setReceiveBufferSize(window)
+        layer.setMaxSegmentSize(mss)
+    client.setSendChannel(clientToServerChannel)
+    client.setReceiveChannel(serverToClientChannel)
+    server.setSendChannel(serverToClientChannel)
+    server.setReceiveChannel(clientToServerChannel)
+    client.setDataToSend(data)
+    if duplex:
+        # the server streams the same data back while it receives (full duplex)
+        server.setDataToSend(data)
+
+    completed = False
+    loopIter = 0
+    while loopIter < maxIterations:
+        loopIter += 1
+        client.processData()
+        clientToServerChannel.processData()
+        server.processData()
+        serverToClientChannel.processData()
+
+        dataReceived = server.dataReceived
+        if len(dataReceived) == len(data) and dataReceived == data:
+            if not duplex or (len(client.dataReceived) == len(data) and client.dataReceived == data):
+                completed = True
+                break
+
+    for recorder in recorders:
+        recorder.close()
+
+    dataPackets = sum(channel.countTotalDataPackets for channel in channels)
+    ackPackets = sum(channel.countAckPackets for channel in channels)
+    return {
+        'loss': loss,
+        'delay': delay,
+        'reorder': reorder,
+        'corruption': corruption,
+        'window': window,
+        'mss': mss,
+        'seed': seed,
+        'completed': completed,
+        'iterations': loopIter,
+        'packetsSent': dataPackets + ackPackets,
+        'dataPackets': dataPackets,
+        'ackPackets': ackPackets,
+        'timeouts': client.countSegmentTimeouts,
+        'fastRetransmits': client.countFastRetransmits,
+        'retransmits': client.countSegmentTimeouts + client.countFastRetransmits,
+        'spuriousRetransmits': client.countSpuriousRetransmissions,
+        'goodput': round(len(server.dataReceived) / loopIter, 4),
+        'exhaustedDecisions': sum(replayer.countExhausted for replayer in replayers),
+    }
+
+
+# #################################################################################################################### #
+# applyLinkProfile()                                                                                                   #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Gives channel its own channel model instances from a link profile dict with the optional keys gilbertElliott         #
+# (pGoodToBad, pBadToGood, lossGood, lossBad), bandwidth and queue (segments, default DEFAULT_QUEUE_SEGMENTS),         #
+# propagationDelay and jitter (iterations)                                                                             #
+#                                                                                                                      #
+# #################################################################################################################### #
+def applyLinkProfile(channel, linkProfile):
+    if linkProfile.get('gilbertElliott'):
+        channel.setLossModel(GilbertElliottLoss(*linkProfile['gilbertElliott']))
+    if linkProfile.get('bandwidth'):
+        channel.setLinkModel(LinkModel(linkProfile['bandwidth'], linkProfile.get('queue', DEFAULT_QUEUE_SEGMENTS)))
+    if linkProfile.get('propagationDelay') or linkProfile.get('jitter'):
+        channel.setDelayModel(DelayModel(linkProfile.get('propagationDelay', 0), linkProfile.get('jitter', 0)))
+
+
+def getLinkProfile(args):
+    return {
+        'gilbertElliott': args.gilbert_elliott,
+        'bandwidth': args.bandwidth,
+        'queue': args.queue,
+        'propagationDelay': args.propagation_delay,
+        'jitter': args.jitter,
+    }
+
+
+def addLinkProfileArguments(parser):
+    parser.add_argument('--gilbert-elliott', type=floatList, metavar='PGB,PBG[,LOSSGOOD,LOSSBAD]',
+                        help="bursty Gilbert-Elliott loss instead of the --loss ratio")
+    parser.add_argument('--bandwidth', type=int, help="segments per iteration the link carries")
+    parser.add_argument('--queue', type=int, default=DEFAULT_QUEUE_SEGMENTS,
+                        help="drop-tail queue length with --bandwidth")
+    parser.add_argument('--propagation-delay', type=int, default=0, help="iterations every segment takes")
+    parser.add_argument('--jitter', type=int, default=0, help="+/- iterations added to the propagation delay")
+
+
+# #################################################################################################################### #
+# sweep()                                                                                                              #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Runs runTransfer() for every combination of the given value lists, runs times each with seeds seed, seed + 1, ...    #
+# Yields one result dict per run.                                                                                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+def sweep(data, losses, delays, reorders, corruptions, windows, mssValues, runs=1, seed=0,
+          maxIterations=MAX_ITERATIONS, linkProfile=None, recordTrace=None, replayTrace=None, duplex=False):
+    combinations = list(itertools.product(losses, delays, reorders, corruptions, windows, mssValues))
+    # a sweep of several runs numbers its traces in run order
+    numbered = len(combinations) * runs > 1
+    index = 0
+    for loss, delay, reorder, corruption, window, mss in combinations:
+        for run in range(runs):
+            suffix = '-{0}'.format(index) if numbered else ''
+            index += 1
+            yield runTransfer(data, loss, delay, reorder, corruption, window, mss, seed + run, maxIterations,
+                              linkProfile,
+                              recordTrace + suffix if recordTrace else None,
+                              replayTrace + suffix if replayTrace else None, duplex)
+
+
+def writeResults(results, outputFile, outputFormat):
+    if outputFormat == 'json':
+        json.dump(list(results), outputFile, indent=2)
+        outputFile.write('\n')
+    else:
+        writer = csv.DictWriter(outputFile, fieldnames=FIELDS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+
+def floatList(text):
+    return [float(value) for value in text.split(',')]
+
+
+def intList(text):
+    return [int(value) for value in text.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless RDT parameter sweeps")
+    parser.add_argument('--loss', type=floatList, default=[UnreliableChannel.RATIO_DROPPED_PACKETS],
+                        help="drop ratios")
+    parser.add_argument('--delay', type=floatList, default=[UnreliableChannel.RATIO_DELAYED_PACKETS],
+                        help="delay ratios")
+    parser.add_argument('--reorder', type=floatList, default=[UnreliableChannel.RATIO_OUT_OF_ORDER_PACKETS],
+                        help="out-of-order ratios")
+    parser.add_argument('--corruption', type=floatList, default=[UnreliableChannel.RATIO_DATA_ERROR_PACKETS],
+                        help="checksum error ratios")
+    parser.add_argument('--window', type=intList, default=[RDTLayer.FLOW_CONTROL_WIN_SIZE],
+                        help="receive buffer sizes")
+    parser.add_argument('--mss', type=intList, default=[RDTLayer.DATA_LENGTH], help="maximum segment sizes")
+    parser.add_argument('--runs', type=int, default=1, help="runs per combination")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first run")
+    parser.add_argument('--max-iterations', type=int, default=MAX_ITERATIONS)
+    addLinkProfileArguments(parser)
+    parser.add_argument('--record-trace', metavar='PREFIX', help="record every channel decision to trace files")
+    parser.add_argument('--replay-trace', metavar='PREFIX', help="force the decisions recorded in trace files")
+    parser.add_argument('--assert-max-iterations', type=int,
+                        help="exit with status 1 if a run is incomplete, takes more iterations or outruns its "
+                             "replayed trace")
+    parser.add_argument('--duplex', action='store_true', help="the server sends the same data back concurrently")
+    parser.add_argument('--data-file', help="send this file's bytes instead of the default text")
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--output', help="output file, standard output if omitted")
+    args = parser.parse_args(argv)
+
+    data = DEFAULT_DATA
+    if args.data_file:
+        with open(args.data_file, 'rb') as payloadFile:
+            data = payloadFile.read()
+
+    results = list(sweep(data, args.loss, args.delay, args.reorder, args.corruption, args.window, args.mss,
+                         args.runs, args.seed, args.max_iterations,
+                         getLinkProfile(args), args.record_trace, args.replay_trace, args.duplex))
+    if args.output:
+        with open(args.output, 'w', newline='') as outputFile:
+            writeResults(results, outputFile, args.format)
+    else:
+        writeResults(results, sys.stdout, args.format)
+
+    for result in results:
+        if result['exhaustedDecisions']:
+            sys.stderr.write("seed {0}: replay ran out of recorded decisions, {1} drawn afresh\n".format(
+                result['seed'], result['exhaustedDecisions']))
+
+    if args.assert_max_iterations is not None:
+        regressions = [result for result in results
+                       if not result['completed'] or result['iterations'] > args.assert_max_iterations]
+        for result in regressions:
+            sys.stderr.write("seed {0}: {1} iterations, limit {2}\n".format(
+                result['seed'], result['iterations'], args.assert_max_iterations))
+        # a run that outran its trace was not measured against the recorded impairments (reported above)
+        if regressions or any(result['exhaustedDecisions'] for result in results):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
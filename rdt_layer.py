@@ -1,10 +1,84 @@
+import math
+from collections import OrderedDict, deque
+
 from segment import Segment
+from congestion import RenoController
+from timer_wheel import TimerWheel
 
     # Citation for the following code
     # Date: 02/26/25
     # Adopted/modifed/based code on:
     # https://gaia.cs.umass.edu/kurose_ross/index.php, https://scis.uohyd.ac.in/~atulcs/computernetworks/lab5.html, https://www.cs.swarthmore.edu/~chaganti/cs43/f19/labs/lab6.html, https://nehakaranjkar.github.io/ProtocolSimulation.html, https://wiki.eecs.yorku.ca/course_archive/2012-13/W/3214/_media/chapter_3_v6_jan2013_part3_4slide.pdf
 
+# #################################################################################################################### #
+# RttEstimator                                                                                                         #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Smoothed round-trip time and variance estimator (RFC 6298) measured in iterations. Produces the retransmission       #
+# timeout (RTO) used by RDTLayer and doubles it on every timeout until the connection makes progress again, or until   #
+# the first RTT sample while there has been none.                                                                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+
+class RttEstimator(object):
+    ALPHA = 0.125                   # gain for the smoothed RTT
+    BETA = 0.25                     # gain for the RTT variance
+    K = 4                           # variance multiplier
+    GRANULARITY = 1                 # clock granularity, one iteration
+
+    def __init__(self, initialTimeout, maxTimeout, minTimeout=GRANULARITY):
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initialTimeout
+        self.maxTimeout = maxTimeout
+        self.minTimeout = minTimeout
+        self.backoffCount = 0
+
+    def addSample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - RttEstimator.BETA) * self.rttvar + RttEstimator.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - RttEstimator.ALPHA) * self.srtt + RttEstimator.ALPHA * rtt
+        self.rto = max(self.srtt + max(RttEstimator.GRANULARITY, RttEstimator.K * self.rttvar), self.minTimeout)
+        self.backoffCount = 0
+
+    def backoff(self):
+        if self.getTimeout() < self.maxTimeout:
+            self.backoffCount += 1
+
+    def resetBackoff(self):
+        # without a sample the timeout may still be below the round trip, so only a sample resets it (Karn)
+        if self.srtt is not None:
+            self.backoffCount = 0
+
+    def getTimeout(self):
+        return min(self.rto * (2 ** self.backoffCount), self.maxTimeout)
+
+
+# #################################################################################################################### #
+# SendWindowEntry                                                                                                      #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Bookkeeping for one unacknowledged segment in RDTLayer's send window. The entry outlives the Segment objects it      #
+# sends, so a retransmission only swaps in a fresh segment.                                                            #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+
+class SendWindowEntry(object):
+    def __init__(self, seq, length, segment):
+        self.seq = seq
+        self.length = length
+        self.segment = segment              # Most recent transmission of this range
+        self.retransmitIteration = -1       # Iteration of the first retransmission, -1 if never retransmitted
+        self.deadline = 0                   # Iteration at which the current transmission times out
+        self.sacked = False                 # Selectively acknowledged, no longer needs retransmission
+        self.transmission = 0               # Position of the most recent transmission in the sender's send order
+
+
 # #################################################################################################################### #
 # RDTLayer                                                                                                             #
 #                                                                                                                      #
@@ -29,9 +103,22 @@ class RDTLayer(object):
     #                                                                                                                  #
     #                                                                                                                  #
     # ################################################################################################################ #
-    DATA_LENGTH = 4 # in characters                     # The length of the string data that will be sent per packet...
-    FLOW_CONTROL_WIN_SIZE = 15 # in characters          # Receive window size for flow-control
-    TIMEOUT_ITERATIONS = 2  # set timeout window to 2 iterations
+    DATA_LENGTH = 4 # in characters                     # Default segment size, used until the MSS is negotiated
+    FLOW_CONTROL_WIN_SIZE = 15 # in characters          # Default receive buffer, advertised to the sender for flow-control
+    TIMEOUT_ITERATIONS = 2  # initial retransmission timeout, used until the first RTT sample
+    MAX_TIMEOUT_ITERATIONS = 64 # upper bound for the backed-off retransmission timeout
+    TIMER_WHEEL_SLOTS = 64  # slots in the retransmission timer wheel
+    SELECTIVE_REPEAT = True # buffer out-of-order segments and report them with selective ACKs
+    MAX_SACK_BLOCKS = 4     # most selective-ACK ranges carried by a single ACK segment
+    PMTU_PROBING = True     # probe the channel for the largest segment that arrives intact
+    MAX_PMTU_PROBES = 3     # unanswered probes of one size before that size is considered too big
+    DUP_ACK_THRESHOLD = 3   # duplicate ACKs that trigger a fast retransmit
+    EARLY_RETRANSMIT = True # lower the threshold when too few segments are outstanding to produce it (RFC 5827)
+    RACK = True             # also declare a segment lost once one sent after it has been acknowledged (RFC 8985)
+    ACK_EVERY_SEGMENTS = 2  # delayed ACKs: acknowledge at least every second in-order segment...
+    ACK_DELAY_ITERATIONS = 0 # ...or once the oldest unacknowledged segment has waited this long
+    QUICK_ACK_SEGMENTS = 16 # in-order segments acknowledged one by one at the start and after a gap or duplicate
+    VERBOSE = True          # print per-segment progress; headless runs (rdt_batch.py) turn it off
     sendChannel = None
     receiveChannel = None
     dataToSend = ''
@@ -50,15 +137,51 @@ class RDTLayer(object):
         self.receiveChannel = None
         self.dataToSend = ''
         self.currentIteration = 0
+        self.verbose = RDTLayer.VERBOSE
         # Add items as needed
         self.dataReceived = "" 
         # Sent
         self.nextSeqSend = 0         # Next character index to send
         self.lastAckReceived = -1    # Highest acknowledged index
-        self.sentSegments = {}       # Cache of sent segments
+        self.sendWindow = deque()    # SendWindowEntry per unacknowledged segment, ordered by sequence number
+        self.sendWindowIndex = {}    # Sequence number -> SendWindowEntry, for selective ACK lookups
+        self.retransmitTimers = TimerWheel(RDTLayer.TIMER_WHEEL_SLOTS) # Retransmission deadlines of window entries
+        self.peerWindow = RDTLayer.FLOW_CONTROL_WIN_SIZE # Receive window last advertised by the peer
+        self.rttEstimator = RttEstimator(RDTLayer.TIMEOUT_ITERATIONS, RDTLayer.MAX_TIMEOUT_ITERATIONS)
+        self.congestionController = RenoController(RDTLayer.DATA_LENGTH)
+        self.dupAckCount = 0         # Duplicate ACKs for lastAckReceived
+        self.inFastRecovery = False
+        self.recoverSeq = 0          # nextSeqSend when fast recovery started; an ACK past it ends recovery
+        self.countTransmissions = 0  # Data segments sent so far, new and retransmitted; numbers each transmission
+        self.rackTransmission = 0    # Most recent transmission known to have arrived (RACK)
+        self.rackRtt = 0             # Round trip of that transmission
+        self.minRtt = None           # Smallest round trip seen, sets the reordering window
+        self.rackDeadline = -1       # Iteration at which a segment sent before it counts as lost, -1 if none
+        self.rackQueue = OrderedDict() # Sequence number -> unacknowledged, unsacked entry, in send order
+        self.rackChanged = False     # rackTransmission or minRtt moved since the last detectLosses()
+        # Segment size
+        self.maxSegmentSize = RDTLayer.DATA_LENGTH # Largest payload this side sends or accepts (MSS option)
+        self.peerMss = -1            # MSS announced by the peer, -1 until the connection setup exchange completes
+        self.segmentSize = RDTLayer.DATA_LENGTH # Payload size used for new segments
+        self.pmtuCeiling = RDTLayer.DATA_LENGTH # Largest segment size not yet ruled out by probing
+        self.probeSize = -1          # Size of the outstanding path MTU probe, -1 if none
+        self.probeDeadline = 0
+        self.probeFailures = 0
+        self.mssRequested = False    # Peer announced its MSS and is waiting for ours
+        self.probeEcho = -1          # Largest probe received since the last ACK
         # Received
         self.nextSeqExpected = 0     # Next expected character index
+        self.receiveBuffer = {}      # Out-of-order payloads keyed by sequence number (selective repeat)
+        self.receiveBufferSize = RDTLayer.FLOW_CONTROL_WIN_SIZE # Characters this side is willing to buffer
+        self.echoIteration = -1      # Send iteration of the segment that last advanced nextSeqExpected
+        self.unackedSegments = 0     # In-order segments received since the last ACK (delayed ACK)
+        self.ackDeadline = -1        # Iteration by which the delayed ACK must go out, -1 if none is pending
+        self.ackImmediately = False  # A gap, gap fill or duplicate was seen: ACK without delay
+        self.ackDelay = RDTLayer.ACK_DELAY_ITERATIONS # Longest an in-order segment waits for its ACK
+        self.quickAckSegments = RDTLayer.QUICK_ACK_SEGMENTS # In-order segments still to be acknowledged without delay
         self.countSegmentTimeouts = 0
+        self.countFastRetransmits = 0
+        self.countSpuriousRetransmissions = 0
 
 
     # ################################################################################################################ #
@@ -87,13 +210,94 @@ class RDTLayer(object):
     # setDataToSend()                                                                                                  #
     #                                                                                                                  #
     # Description:                                                                                                     #
-    # Called by main to set the string data to send                                                                    #
-    #                                                                                                                  #
+    # Called by main to set the string data to send. bytes / bytearray data switches to binary mode: segments carry    #
+    # memoryview slices of the caller's buffer instead of copies.                                                      #
     #                                                                                                                  #
     # ################################################################################################################ #
     def setDataToSend(self,data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = memoryview(data).cast('B')
         self.dataToSend = data
 
+    # ################################################################################################################ #
+    # setVerbose()                                                                                                     #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Turns per-segment console output on or off                                                                       #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def setVerbose(self, verbose):
+        self.verbose = verbose
+
+    # ################################################################################################################ #
+    # log()                                                                                                            #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # print() when verbose                                                                                             #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def log(self, *args):
+        if self.verbose:
+            print(*args)
+
+    # ################################################################################################################ #
+    # setMaxSegmentSize()                                                                                              #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Sets this connection's maximum segment size. Both sides announce theirs when the connection starts and use the   #
+    # smaller one; the sender then probes the channel for the largest size that actually gets through.                 #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def setMaxSegmentSize(self, size):
+        self.maxSegmentSize = size
+        self.segmentSize = min(self.segmentSize, size)
+
+    # ################################################################################################################ #
+    # setReceiveBufferSize()                                                                                           #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Sets how many characters this side buffers past nextSeqExpected; advertised to the peer in every ACK             #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def setReceiveBufferSize(self, size):
+        self.receiveBufferSize = size
+
+    # ################################################################################################################ #
+    # setTimeouts()                                                                                                    #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Sets the initial, maximum and minimum retransmission timeout in iterations, for callers whose iteration is not   #
+    # the lockstep loop's (e.g. a real-time clock in milliseconds). The minimum must exceed the peer's ACK delay.      #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def setTimeouts(self, initialTimeout, maxTimeout, minTimeout=RttEstimator.GRANULARITY):
+        self.rttEstimator = RttEstimator(initialTimeout, maxTimeout, minTimeout)
+
+    # ################################################################################################################ #
+    # setAckDelay()                                                                                                    #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Sets how many iterations an in-order segment may wait for its delayed ACK. The lockstep loop keeps 0: everything #
+    # that arrives in one iteration is acknowledged together at its end.                                               #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def setAckDelay(self, delay):
+        self.ackDelay = delay
+
+    # ################################################################################################################ #
+    # setCongestionController()                                                                                        #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Replaces the congestion control policy (see congestion.py). None disables congestion control, leaving only the   #
+    # flow-control window.                                                                                             #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def setCongestionController(self, controller):
+        self.congestionController = controller
+
     # ################################################################################################################ #
     # getDataReceived()                                                                                                #
     #                                                                                                                  #
@@ -106,33 +310,306 @@ class RDTLayer(object):
         # ############################################################################################################ #
         # Identify the data that has been received...
 
-        print('getDataReceived():' + self.dataReceived)
+        if not self.verbose:
+            pass
+        elif isinstance(self.dataReceived, str):
+            print('getDataReceived():' + self.dataReceived)
+        else:
+            print('getDataReceived(): {0} bytes'.format(len(self.dataReceived)))
         return self.dataReceived
 
+    # ################################################################################################################ #
+    # deliverPayload()                                                                                                 #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Appends in-order data to dataReceived. Binary payloads go into a bytearray that grows in place, so a transfer    #
+    # costs linear time in its size.                                                                                   #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def deliverPayload(self, payload):
+        if not isinstance(payload, str) and isinstance(self.dataReceived, str):
+            self.dataReceived = bytearray()
+        self.dataReceived += payload
+        self.nextSeqExpected += len(payload)
+
     # ################################################################################################################ #
     # processData()                                                                                                    #Description:                                                                                                     #
     # "timeslice". Called by main once per iteration  ################################################################################################################ #
-    def processData(self):
-        self.currentIteration += 1
-
-        # Check for timeouts
-        for seq, seg in list(self.sentSegments.items()):
-            if (self.currentIteration - seg.getStartIteration()) >= RDTLayer.TIMEOUT_ITERATIONS:
-                print("Segment with seq", seq, "timed out. Retransmitting.")
-                self.countSegmentTimeouts += 1
-                # helps with checksum errors
-                data_chunk = self.dataToSend[seq : seq + RDTLayer.DATA_LENGTH]
-                new_seg = Segment()
-                new_seg.setData(str(seq), data_chunk)
-                new_seg.setStartIteration(self.currentIteration)
-                # Update the cache with the new segment.
-                self.sentSegments[seq] = new_seg
-                self.sendChannel.send(new_seg)
-        
+    # An event-driven caller (rdt_async.py) passes its own clock instead, in iterations (e.g. milliseconds).           #
+    def processData(self, currentIteration=None):
+        if currentIteration is None:
+            self.currentIteration += 1
+        else:
+            self.currentIteration = max(self.currentIteration, currentIteration)
+
+        # Process incoming ACKs first so segments acknowledged this iteration do not time out
+        self.processReceiveAndSendRespond()
+        timers = self.retransmitTimers.advance(self.currentIteration)
+
+        # Segments overtaken by acknowledged ones are lost; all ACKs of the iteration are in, so reordering within it
+        # does not count. Only new RACK state or the RACK timer can make a segment lost.
+        if RDTLayer.RACK and (self.rackChanged or any(entry is None and self.isTimerCurrent((entry, deadline))
+                                                      for entry, deadline in timers)):
+            self.detectLosses()
+
+        # Check for timeouts. Timers of entries that were acknowledged or re-armed since are skipped: only the timer
+        # armed with the entry's current deadline counts, even when a clock jump expires a stale timer along with it.
+        expired = [entry for entry, deadline in timers
+                   if entry is not None and self.isTimerCurrent((entry, deadline))]
+        # an entry re-armed twice for the same deadline has two matching timers
+        expired = list({id(entry): entry for entry in expired}.values())
+
+        # Exponential backoff and congestion response, once per expiry. A timeout ends fast recovery.
+        if expired:
+            self.rttEstimator.backoff()
+            self.inFastRecovery = False
+            self.dupAckCount = 0
+            if self.congestionController is not None:
+                self.congestionController.onTimeout(self.getFlightSize(), self.currentIteration)
+
+        for entry in expired:
+            self.log("Segment with seq", entry.seq, "timed out. Retransmitting.")
+            self.countSegmentTimeouts += 1
+            self.retransmitEntry(entry)
+
         # Send segments
         self.processSend()
-        
-        self.processReceiveAndSendRespond()
+
+        # ACK whatever the outgoing data did not already acknowledge
+        self.processAckSend()
+
+    # ################################################################################################################ #
+    # retransmitEntry()                                                                                                #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Resends a window entry as a fresh segment and re-arms its timer                                                  #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def retransmitEntry(self, entry):
+        # helps with checksum errors
+        new_seg = self.createDataSegment(entry.seq, entry.length)
+        # Update the window entry with the new segment.
+        entry.segment = new_seg
+        self.countTransmissions += 1
+        entry.transmission = self.countTransmissions
+        self.rackQueue.move_to_end(entry.seq)
+        if entry.retransmitIteration < 0:
+            entry.retransmitIteration = self.currentIteration
+        self.armRetransmitTimer(entry)
+        self.sendChannel.send(new_seg)
+
+    # ################################################################################################################ #
+    # createDataSegment()                                                                                              #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Builds a fresh data segment for [seq, seq + length). Once this side has received data the segment also           #
+    # carries the acknowledgment (piggybacking), and until the peer's MSS is known it carries the MSS option.          #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def createDataSegment(self, seq, length):
+        segment = Segment()
+        segment.setData(seq, self.dataToSend[seq : seq + length])
+        segment.setStartIteration(self.currentIteration)
+        if self.nextSeqExpected > 0 or self.receiveBuffer:
+            self.fillAckFields(segment)
+        if self.peerMss < 0:
+            segment.setMss(self.maxSegmentSize)
+        return segment
+
+    # ################################################################################################################ #
+    # fillAckFields()                                                                                                  #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Writes the current acknowledgment state (cumulative ACK, SACK blocks, timestamp echo, window, option replies)    #
+    # into an outgoing pure ACK or data segment and clears the pending delayed ACK                                     #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def fillAckFields(self, segment):
+        segment.attachAck(self.nextSeqExpected, self.getSackBlocks())
+        segment.setEchoIteration(self.echoIteration)
+        # The window is measured from nextSeqExpected. In-order data is delivered at once, and out-of-order data held in
+        # receiveBuffer lies inside the window the sender already counts as in flight, so it must not shrink it again.
+        segment.setWindow(self.receiveBufferSize)
+        if self.mssRequested:
+            segment.setMss(self.maxSegmentSize, True)
+            self.mssRequested = False
+        if self.probeEcho > 0:
+            segment.setProbe(self.probeEcho)
+            self.probeEcho = -1
+        self.unackedSegments = 0
+        self.ackDeadline = -1
+        self.ackImmediately = False
+
+    # ################################################################################################################ #
+    # processAckSend()                                                                                                 #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Sends a pure ACK when one is due and no data segment of this iteration carried it: after a gap fill, quick-ACK   #
+    # segment, duplicate or option that needs a reply, or when the delayed-ACK timer runs out. Every                   #
+    # ACK_EVERY_SEGMENTS in-order segments are acknowledged in processDataSegment(). Nothing is sent when no data      #
+    # arrived.                                                                                                         #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def processAckSend(self):
+        timerExpired = 0 <= self.ackDeadline <= self.currentIteration
+        if not (self.ackImmediately or timerExpired or self.mssRequested or self.probeEcho > 0):
+            return
+
+        self.sendAck()
+
+    # ################################################################################################################ #
+    # sendAck()                                                                                                        #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Sends a pure ACK segment with the current acknowledgment state                                                   #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def sendAck(self):
+        segmentAck = Segment()
+        self.fillAckFields(segmentAck)
+        if self.verbose:
+            print("Sending ack:", segmentAck.to_string())
+        self.sendChannel.send(segmentAck)
+
+    # ################################################################################################################ #
+    # processPathMtuProbe()                                                                                            #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Binary search for the largest payload the channel delivers, between the confirmed segment size and the           #
+    # negotiated MSS. Probes are padding-only segments, so a probe that is too big never holds up real data.           #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def processPathMtuProbe(self):
+        if self.probeSize > 0 and self.currentIteration >= self.probeDeadline:
+            self.probeFailures += 1
+            if self.probeFailures >= RDTLayer.MAX_PMTU_PROBES:
+                self.log("Path MTU probe of", self.probeSize, "failed. Segment size stays", self.segmentSize)
+                self.pmtuCeiling = self.probeSize - 1
+                self.probeFailures = 0
+            self.probeSize = -1
+
+        if self.probeSize > 0 or self.segmentSize >= self.pmtuCeiling or self.nextSeqSend >= len(self.dataToSend):
+            return
+
+        self.probeSize = (self.segmentSize + self.pmtuCeiling + 1) // 2
+        self.probeDeadline = self.currentIteration + math.ceil(self.rttEstimator.getTimeout())
+        padding = 'P' * self.probeSize if isinstance(self.dataToSend, str) else b'P' * self.probeSize
+        probe = Segment()
+        probe.setData(-1, padding)
+        probe.setProbe(self.probeSize)
+        probe.setStartIteration(self.currentIteration)
+        self.log("Sending path MTU probe of", self.probeSize)
+        self.sendChannel.send(probe)
+
+    # ################################################################################################################ #
+    # processSegmentSizeOptions()                                                                                      #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Handles the MSS option and probe replies carried by an incoming segment                                          #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def processSegmentSizeOptions(self, seg):
+        if seg.getMss() > 0:
+            # an option that is not itself a reply waits for ours
+            if not seg.isMssReply():
+                self.mssRequested = True
+            if self.peerMss < 0:
+                self.peerMss = seg.getMss()
+                negotiated = min(self.maxSegmentSize, self.peerMss)
+                self.pmtuCeiling = negotiated
+                self.segmentSize = min(RDTLayer.DATA_LENGTH, negotiated)
+                if not RDTLayer.PMTU_PROBING:
+                    self.segmentSize = negotiated
+                if self.congestionController is not None:
+                    self.congestionController.setMss(self.segmentSize)
+                self.log("Negotiated MSS:", negotiated)
+
+        # probe replies only ever raise the confirmed size
+        if seg.acknum != -1 and seg.getProbe() > self.segmentSize:
+            self.segmentSize = min(seg.getProbe(), self.pmtuCeiling)
+            if self.congestionController is not None:
+                self.congestionController.setMss(self.segmentSize)
+            if seg.getProbe() >= self.probeSize:
+                self.probeSize = -1
+                self.probeFailures = 0
+            self.log("Path MTU probe confirmed. Segment size:", self.segmentSize)
+
+    # ################################################################################################################ #
+    # armRetransmitTimer()                                                                                             #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Schedules the retransmission deadline of a window entry's latest transmission using the current timeout          #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def armRetransmitTimer(self, entry):
+        entry.deadline = entry.segment.getStartIteration() + math.ceil(self.rttEstimator.getTimeout())
+        self.retransmitTimers.schedule(entry.deadline, (entry, entry.deadline))
+
+    # ################################################################################################################ #
+    # isTimerCurrent()                                                                                                 #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Whether a timer from retransmitTimers still counts: an (entry, deadline) retransmission timer as long as the     #
+    # entry is unacknowledged and was not re-armed since, a (None, deadline) RACK timer while rackDeadline is the same #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def isTimerCurrent(self, timer):
+        entry, deadline = timer
+        if entry is None:
+            return deadline == self.rackDeadline
+        return deadline == entry.deadline and not entry.sacked and self.sendWindowIndex.get(entry.seq) is entry
+
+    # ################################################################################################################ #
+    # getNextDeadline()                                                                                                #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Earliest iteration at which processData() has timer work (retransmission, delayed ACK, path MTU probe), or None. #
+    # Event-driven callers arm a single loop timer for it instead of calling processData() every iteration.            #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def getNextDeadline(self):
+        deadlines = []
+        # retransmission and RACK timers, skipping the ones cancelled since they were armed
+        timerDeadline = self.retransmitTimers.nextDeadline(self.isTimerCurrent)
+        if timerDeadline is not None:
+            deadlines.append(timerDeadline)
+        if self.ackDeadline >= 0:
+            deadlines.append(self.ackDeadline)
+        if self.probeSize > 0:
+            deadlines.append(self.probeDeadline)
+        return min(deadlines) if deadlines else None
+
+    # ################################################################################################################ #
+    # getFlightSize()                                                                                                  #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Characters sent but not yet cumulatively acknowledged                                                            #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def getFlightSize(self):
+        return self.nextSeqSend - max(self.lastAckReceived, 0)
+
+    # ################################################################################################################ #
+    # getSendWindow()                                                                                                  #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Effective send window: the receiver's advertised window, limited by the congestion window when one is in use     #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def getSendWindow(self):
+        window = self.peerWindow
+        if self.congestionController is not None:
+            window = min(window, self.congestionController.getWindow())
+        # with nothing in flight, always allow one segment so a closed window is probed
+        if self.getFlightSize() == 0:
+            window = max(window, 1)
+        return window
 
     # ################################################################################################################ #
     # processSend()                                                                                                    #
@@ -143,18 +620,32 @@ class RDTLayer(object):
     #                                                                                                                  #
     # ################################################################################################################ #
     def processSend(self):
-        while (self.nextSeqSend < len(self.dataToSend) and 
-            (self.nextSeqSend - (self.lastAckReceived + 1)) < RDTLayer.FLOW_CONTROL_WIN_SIZE):
-            segmentSend = Segment()
-            data_chunk = self.dataToSend[self.nextSeqSend : self.nextSeqSend + RDTLayer.DATA_LENGTH]
-            seqnum_str = str(self.nextSeqSend)
-            segmentSend.setData(seqnum_str, data_chunk)
-            # keep track of iteration 
-            segmentSend.setStartIteration(self.currentIteration)
-            print("processSend(): Sending segment:", segmentSend.to_string())
+        if RDTLayer.PMTU_PROBING and self.peerMss > 0:
+            self.processPathMtuProbe()
+
+        window = self.getSendWindow()
+        while self.nextSeqSend < len(self.dataToSend) and self.getFlightSize() < window:
+            # window accounting is in characters/bytes: a segment never runs past the window
+            usable = window - self.getFlightSize()
+            length = min(self.segmentSize, len(self.dataToSend) - self.nextSeqSend)
+            if length > usable:
+                # silly window avoidance: wait for room for a full segment unless nothing is in flight
+                if self.getFlightSize() > 0:
+                    break
+                length = usable
+            segmentSend = self.createDataSegment(self.nextSeqSend, length)
+            data_chunk = segmentSend.payload
+            if self.verbose:
+                print("processSend(): Sending segment:", segmentSend.to_string())
             
             # save segment incase of timeout and retransmission 
-            self.sentSegments[self.nextSeqSend] = segmentSend
+            entry = SendWindowEntry(self.nextSeqSend, len(data_chunk), segmentSend)
+            self.countTransmissions += 1
+            entry.transmission = self.countTransmissions
+            self.sendWindow.append(entry)
+            self.sendWindowIndex[entry.seq] = entry
+            self.rackQueue[entry.seq] = entry
+            self.armRetransmitTimer(entry)
             
             # Send the segment via the unreliable send channel.
             self.sendChannel.send(segmentSend)
@@ -163,35 +654,313 @@ class RDTLayer(object):
             self.nextSeqSend += len(data_chunk)
 
     def processReceiveAndSendRespond(self):
-        segmentAck = Segment()  
         listIncomingSegments = self.receiveChannel.receive()
 
         for seg in listIncomingSegments:
+            # Segments carrying a payload are only trusted, piggybacked ACK included, if the checksum holds
+            if seg.payload and not seg.checkChecksum():
+                if self.verbose:
+                    print("Checksum error in received segment:", seg.to_string())
+                continue
+
+            self.processSegmentSizeOptions(seg)
+
             # Process segments with acknolegments 
             if seg.acknum != -1:
-                ack_val = int(seg.acknum)
-                if ack_val > self.lastAckReceived:
-                    self.lastAckReceived = ack_val
-                    keys_to_remove = [k for k in self.sentSegments if k < ack_val]
-                    for key in keys_to_remove:
-                        del self.sentSegments[key]
-                continue
+                self.processAck(seg)
 
             # Process data segments
-            elif seg.seqnum != -1:
-                if not seg.checkChecksum():
-                    print("Checksum error in received segment:", seg.to_string())
-                    continue
-                seg_seq = int(seg.seqnum)
-                # meant to work only if no checksum error and in-order, adds to dataReceived (ouput)
-                if seg_seq == self.nextSeqExpected:
-                    self.dataReceived += seg.payload
-                    self.nextSeqExpected += len(seg.payload)
-                    print("Received in-order segment. Updated dataReceived:", self.dataReceived)
+            if seg.seqnum != -1:
+                self.processDataSegment(seg)
+
+            # Path MTU probes are answered in the next ACK
+            elif seg.getProbe() > 0 and seg.payload:
+                self.probeEcho = max(self.probeEcho, len(seg.payload))
+
+        # arm the delayed-ACK timer for in-order data that has not been acknowledged yet
+        if self.unackedSegments > 0 and self.ackDeadline < 0:
+            self.ackDeadline = self.currentIteration + self.ackDelay
+
+    # ################################################################################################################ #
+    # processDataSegment()                                                                                             #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Delivers or buffers the payload of a data segment and decides how urgently it has to be acknowledged             #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def processDataSegment(self, seg):
+        seg_seq = seg.seqnum
+        # meant to work only if no checksum error and in-order, adds to dataReceived (ouput)
+        if seg_seq == self.nextSeqExpected:
+            self.echoIteration = seg.getStartIteration()
+            self.deliverPayload(seg.payload)
+            self.unackedSegments += 1
+            # segments buffered earlier may now be in order
+            while self.nextSeqExpected in self.receiveBuffer:
+                self.deliverPayload(self.receiveBuffer.pop(self.nextSeqExpected))
+                self.ackImmediately = True
+            # Right after a loss the sender's window is small, and one lost ACK per window would cost a timeout.
+            # Until QUICK_ACK_SEGMENTS segments have arrived in order again, no in-order segment waits for the
+            # delayed-ACK timer. With data of its own to send, this side lets that data carry the ACK and
+            # processAckSend() sends a pure ACK only if none went out.
+            if self.receiveBuffer or self.quickAckSegments > 0:
+                self.quickAckSegments = max(self.quickAckSegments - 1, 0)
+                if self.nextSeqSend < len(self.dataToSend):
+                    self.ackImmediately = True
                 else:
-                    print("Discarding out-of-order segment. Expected:", self.nextSeqExpected, "Got:", seg_seq)
+                    self.sendAck()
+            # every ACK_EVERY_SEGMENTS in-order segments are acknowledged as they arrive, not once per batch
+            if self.unackedSegments >= RDTLayer.ACK_EVERY_SEGMENTS:
+                self.sendAck()
+            if isinstance(self.dataReceived, str):
+                self.log("Received in-order segment. Updated dataReceived:", self.dataReceived)
+            else:
+                self.log("Received in-order segment. Bytes received:", len(self.dataReceived))
+        elif (RDTLayer.SELECTIVE_REPEAT and seg_seq > self.nextSeqExpected and
+              seg_seq - self.nextSeqExpected < self.receiveBufferSize):
+            self.receiveBuffer.setdefault(seg_seq, seg.payload)
+            self.log("Buffering out-of-order segment. Expected:", self.nextSeqExpected, "Got:", seg_seq)
+            self.quickAckSegments = RDTLayer.QUICK_ACK_SEGMENTS
+            # a gap: one immediate (duplicate) ACK per out-of-order segment drives the sender's fast retransmit
+            self.sendAck()
+        else:
+            # a duplicate means the sender missed an ACK
+            self.ackImmediately = True
+            self.quickAckSegments = RDTLayer.QUICK_ACK_SEGMENTS
+            self.log("Discarding out-of-order segment. Expected:", self.nextSeqExpected, "Got:", seg_seq)
+
+    # ################################################################################################################ #
+    # processAck()                                                                                                     #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Releases segments covered by a cumulative or selective ACK, records the advertised window, feeds the RTT         #
+    # estimator and detects spurious retransmissions                                                                   #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def processAck(self, seg):
+        ack_val = seg.acknum
+        echoIteration = seg.getEchoIteration()
+        window = seg.getWindow()
+        advanced = ack_val > self.lastAckReceived
+
+        # ignore window updates from ACKs that were overtaken by newer ones
+        if window >= 0 and ack_val >= self.lastAckReceived:
+            self.peerWindow = window
+
+        # a pure ACK repeating the cumulative ACK while data is outstanding is a duplicate, unless it answers a path
+        # MTU probe: probes carry no data, so their replies say nothing about a hole
+        if (not advanced and not seg.payload and seg.getProbe() <= 0 and ack_val == self.lastAckReceived and
+                self.sendWindow):
+            self.processDuplicateAck()
+
+        newlyAcked = []
+        answeredEarlier = None
+        if advanced:
+            self.dupAckCount = 0
+            # The segment at the old left edge is the one whose arrival advanced the receiver. If the receiver echoes
+            # a send iteration older than its retransmission, the original got through and the retransmission was
+            # spurious.
+            if self.sendWindow:
+                oldest = self.sendWindow[0]
+                if 0 <= oldest.retransmitIteration and 0 <= echoIteration < oldest.retransmitIteration:
+                    self.countSpuriousRetransmissions += 1
+                # an echo older than the latest transmission: an earlier one arrived, so it says nothing for RACK
+                if 0 <= echoIteration < oldest.segment.getStartIteration():
+                    answeredEarlier = oldest
+            self.lastAckReceived = ack_val
+            # forward progress shows the path works again, so drop the backed-off timeout
+            self.rttEstimator.resetBackoff()
+            # cumulative ACK: pop the acknowledged prefix of the window
+            while self.sendWindow and self.sendWindow[0].seq < ack_val:
+                entry = self.sendWindow.popleft()
+                del self.sendWindowIndex[entry.seq]
+                if not entry.sacked:
+                    del self.rackQueue[entry.seq]
+                    newlyAcked.append(entry)
+
+        # selectively acknowledged ranges no longer need retransmission
+        for start, end in seg.sack:
+            seq = start
+            while seq < end:
+                entry = self.sendWindowIndex.get(seq)
+                if entry is None:
+                    break
+                if not entry.sacked:
+                    entry.sacked = True
+                    del self.rackQueue[entry.seq]
+                    newlyAcked.append(entry)
+                seq += entry.length
+
+        for entry in newlyAcked:
+            if entry is not answeredEarlier:
+                self.updateRack(entry)
 
-        acknum_str = str(self.nextSeqExpected)
-        segmentAck.setAck(acknum_str)
-        print("Sending ack:", segmentAck.to_string())
-        self.sendChannel.send(segmentAck)
\ No newline at end of file
+        recoveryAck = self.inFastRecovery and advanced
+        if recoveryAck:
+            if ack_val >= self.recoverSeq:
+                # full ACK: everything outstanding at the loss is acknowledged
+                self.inFastRecovery = False
+                if self.congestionController is not None:
+                    self.congestionController.onRecoveryExit()
+            else:
+                # partial ACK (NewReno): the next hole is lost too, resend it without waiting for more duplicates.
+                # RACK already resends every hole sent before the acknowledged retransmission.
+                if not RDTLayer.RACK and self.sendWindow and not self.sendWindow[0].sacked:
+                    self.log("Partial ACK during fast recovery. Retransmitting seq", self.sendWindow[0].seq)
+                    self.countFastRetransmits += 1
+                    self.retransmitEntry(self.sendWindow[0])
+                if self.congestionController is not None:
+                    self.congestionController.onPartialAck(sum(entry.length for entry in newlyAcked))
+
+        if not newlyAcked:
+            return
+
+        # Karn's rule: sample the most recently sent of the newly acknowledged segments that were never retransmitted
+        sendIterations = [entry.segment.getStartIteration() for entry in newlyAcked if entry.retransmitIteration < 0]
+        rttSample = None
+        if sendIterations:
+            rttSample = self.currentIteration - max(sendIterations)
+            self.rttEstimator.addSample(rttSample)
+
+        # window growth pauses during fast recovery
+        if self.congestionController is not None and not self.inFastRecovery and not recoveryAck:
+            bytesAcked = sum(entry.length for entry in newlyAcked)
+            self.congestionController.onAck(bytesAcked, self.getFlightSize(), self.currentIteration, rttSample)
+
+    # ################################################################################################################ #
+    # processDuplicateAck()                                                                                            #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Counts duplicate ACKs. Reaching the threshold retransmits the oldest segment at once (fast retransmit) and       #
+    # enters fast recovery, where each further duplicate inflates the window instead of collapsing it.                 #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def processDuplicateAck(self):
+        self.dupAckCount += 1
+        if self.inFastRecovery:
+            if self.congestionController is not None:
+                self.congestionController.onRecoveryDupAck()
+            return
+
+        if self.dupAckCount < self.getDupAckThreshold():
+            return
+
+        entry = self.sendWindow[0]
+        if entry.sacked:
+            return
+        self.log("Fast retransmit after", self.dupAckCount, "duplicate ACKs. Retransmitting seq", entry.seq)
+        self.enterFastRecovery()
+        self.countFastRetransmits += 1
+        self.retransmitEntry(entry)
+
+    # ################################################################################################################ #
+    # enterFastRecovery()                                                                                              #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Starts a fast recovery episode: the congestion window is reduced once, and an ACK past recoverSeq ends it        #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def enterFastRecovery(self):
+        self.inFastRecovery = True
+        self.recoverSeq = self.nextSeqSend
+        if self.congestionController is not None:
+            self.congestionController.onFastRetransmit(self.getFlightSize(), self.dupAckCount, self.currentIteration)
+
+    # ################################################################################################################ #
+    # updateRack()                                                                                                     #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Records a newly acknowledged entry as rackTransmission if it was sent after the current one. A retransmission    #
+    # acked sooner than minRtt was most likely answered by its original and is skipped.                                #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def updateRack(self, entry):
+        sent = entry.segment.getStartIteration()
+        rtt = self.currentIteration - sent
+        if entry.retransmitIteration >= 0 and rtt < max(self.minRtt or 0, RttEstimator.GRANULARITY):
+            return
+        if self.minRtt is None or rtt < self.minRtt:
+            self.minRtt = rtt
+            self.rackChanged = True
+        if entry.transmission > self.rackTransmission:
+            self.rackTransmission = entry.transmission
+            self.rackRtt = rtt
+            self.rackChanged = True
+
+    # ################################################################################################################ #
+    # detectLosses()                                                                                                   #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # RACK loss detection. An unacknowledged entry sent before rackTransmission is lost once it has been out for       #
+    # rackRtt plus a reordering window of minRtt / 4. This needs one ACK rather than DUP_ACK_THRESHOLD duplicates,     #
+    # and it also catches lost retransmissions, which otherwise wait for a backed-off RTO.                             #
+    # rackQueue is in send order, so the walk stops at the first entry that is not lost yet and arms the RACK timer    #
+    # for it.                                                                                                          #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def detectLosses(self):
+        self.rackChanged = False
+        self.rackDeadline = -1
+        if self.rackTransmission == 0:
+            return
+        reorderWindow = self.minRtt // 4
+        lost = []
+        for entry in self.rackQueue.values():
+            if entry.transmission >= self.rackTransmission:
+                break
+            deadline = entry.segment.getStartIteration() + self.rackRtt + reorderWindow
+            if deadline > self.currentIteration:
+                # entries sent later are due later
+                self.rackDeadline = deadline
+                self.retransmitTimers.schedule(deadline, (None, deadline))
+                break
+            lost.append(entry)
+        if not lost:
+            return
+
+        if not self.inFastRecovery:
+            self.enterFastRecovery()
+        for entry in lost:
+            self.log("Segment with seq", entry.seq, "overtaken by an acknowledged segment. Retransmitting.")
+            self.countFastRetransmits += 1
+            self.retransmitEntry(entry)
+
+    # ################################################################################################################ #
+    # getDupAckThreshold()                                                                                             #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # DUP_ACK_THRESHOLD, or with early retransmit one less than the outstanding segments when fewer than four are      #
+    # outstanding and no new data can go out                                                                           #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def getDupAckThreshold(self):
+        if not RDTLayer.EARLY_RETRANSMIT:
+            return RDTLayer.DUP_ACK_THRESHOLD
+        outstanding = len(self.sendWindow)
+        canSendNewData = (self.nextSeqSend < len(self.dataToSend) and
+                          self.getFlightSize() + self.segmentSize <= self.getSendWindow())
+        if outstanding <= RDTLayer.DUP_ACK_THRESHOLD and not canSendNewData:
+            return max(outstanding - 1, 1)
+        return RDTLayer.DUP_ACK_THRESHOLD
+
+    # ################################################################################################################ #
+    # getSackBlocks()                                                                                                  #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Collapses the out-of-order receive buffer into [start, end) ranges for a selective ACK, lowest first             #
+    #                                                                                                                  #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def getSackBlocks(self):
+        blocks = []
+        for seq in sorted(self.receiveBuffer):
+            end = seq + len(self.receiveBuffer[seq])
+            if blocks and blocks[-1][1] == seq:
+                blocks[-1][1] = end
+            elif len(blocks) < RDTLayer.MAX_SACK_BLOCKS:
+                blocks.append([seq, end])
+            else:
+                break
+        return [tuple(block) for block in blocks]
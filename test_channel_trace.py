@@ -0,0 +1,73 @@
+import struct
+
+import pytest
+
+from channel_trace import MAGIC, RECORD, DELAY, DROP, LATENCY, REORDER, TraceRecorder, TraceReplayer, readTrace
+from rdt_batch import DEFAULT_DATA, main, runTransfer
+from segment import Segment
+
+
+def test_record_format():
+    # iteration (uint32), kind (uint8), outcome (uint16), seq and ack (int32), little endian with no padding
+    assert RECORD.format == '<IBHii'
+    assert RECORD.size == 15
+    assert RECORD.pack(1, DROP, 1, 2, -1) == struct.pack('<IBHii', 1, DROP, 1, 2, -1)
+
+
+def test_records_round_trip(tmp_path):
+    path = str(tmp_path / 'run.c2s')
+    seg = Segment()
+    seg.setData(40, "abcd")
+    recorder = TraceRecorder(path)
+    recorder.record(7, REORDER, None, True)
+    recorder.record(8, DROP, seg, False)
+    recorder.record(2 ** 32 - 1, LATENCY, seg, 65535)
+    recorder.close()
+
+    with open(path, 'rb') as traceFile:
+        data = traceFile.read()
+    assert data.startswith(MAGIC)
+    assert len(data) == len(MAGIC) + 3 * RECORD.size
+    assert readTrace(path) == [(7, REORDER, 1, -1, -1), (8, DROP, 0, 40, seg.acknum),
+                               (2 ** 32 - 1, LATENCY, 65535, 40, seg.acknum)]
+
+    replayer = TraceReplayer(path)
+    assert replayer.nextOutcome(DROP) == 0
+    assert replayer.nextOutcome(DELAY) is None
+    assert replayer.countExhausted == 1
+
+
+def test_read_rejects_other_files(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(b'not a trace')
+    with pytest.raises(ValueError):
+        readTrace(str(path))
+
+
+@pytest.mark.parametrize('duplex', [False, True])
+def test_replay_reproduces_run_with_other_seed(tmp_path, duplex):
+    prefix = str(tmp_path / 'base')
+    recorded = runTransfer(DEFAULT_DATA, 0.1, 0.1, 0.1, 0.1, 15, 4, seed=0, recordTrace=prefix, duplex=duplex)
+    # a different seed would give a different run; the replayed decisions must override it completely
+    unreplayed = runTransfer(DEFAULT_DATA, 0.1, 0.1, 0.1, 0.1, 15, 4, seed=1, duplex=duplex)
+    replayed = runTransfer(DEFAULT_DATA, 0.1, 0.1, 0.1, 0.1, 15, 4, seed=1, replayTrace=prefix, duplex=duplex)
+
+    assert recorded['completed']
+    assert unreplayed['iterations'] != recorded['iterations']
+    del recorded['seed'], replayed['seed']
+    assert replayed == recorded
+    assert replayed['exhaustedDecisions'] == 0
+
+
+def test_replay_reports_exhausted_trace(tmp_path):
+    prefix = str(tmp_path / 'short')
+    runTransfer(DEFAULT_DATA[:40], 0.1, 0.1, 0.1, 0.1, 15, 4, seed=0, recordTrace=prefix)
+    # the default data needs more decisions than the short run recorded
+    replayed = runTransfer(DEFAULT_DATA, 0.1, 0.1, 0.1, 0.1, 15, 4, seed=0, replayTrace=prefix)
+    assert replayed['completed']
+    assert replayed['exhaustedDecisions'] > 0
+
+    with pytest.raises(SystemExit) as exitInfo:
+        main(['--replay-trace', prefix, '--assert-max-iterations', str(replayed['iterations']),
+              '--output', str(tmp_path / 'results.csv')])
+    assert exitInfo.value.code == 1
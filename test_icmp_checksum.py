@@ -0,0 +1,64 @@
+import importlib.util
+import os
+import struct
+
+import pytest
+
+# The module name has a hyphen, so it is loaded from its path
+spec = importlib.util.spec_from_file_location(
+    'IcmpHelperLibrary', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'IcmpHelperLibrary-1.py'))
+icmpHelperLibrary = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(icmpHelperLibrary)
+IcmpPacket = icmpHelperLibrary.IcmpHelperLibrary.IcmpPacket
+
+
+# Full RFC 1071 checksum of packet with its checksum field taken as zero
+def fullChecksum(packet):
+    packet = packet[:2] + b'\x00\x00' + packet[4:]
+    if len(packet) % 2 == 1:
+        packet += b'\x00'
+    checksum = sum(struct.unpack('!%dH' % (len(packet) // 2), packet))
+    while checksum >> 16:
+        checksum = (checksum >> 16) + (checksum & 0xffff)
+    return ~checksum & 0xffff
+
+
+# Timestamps whose packed words are all 0x0000, all 0xffff (a NaN) and an ordinary mix
+TIMESTAMPS = [0.0, struct.unpack('d', b'\xff' * 8)[0], 1700000000.25]
+
+
+def buildPacket(monkeypatch, timestamp, sequence):
+    monkeypatch.setattr(icmpHelperLibrary.time, 'time', lambda: timestamp)
+    packet = IcmpPacket()
+    packet.buildPacket_echoRequest(0x1234, sequence)
+    return packet
+
+
+@pytest.mark.parametrize('timestamp', TIMESTAMPS, ids=['zero', 'ones', 'mixed'])
+def test_incremental_update_matches_full_checksum(monkeypatch, timestamp):
+    # Every sequence number in turn, so the update runs from and to every checksum value this packet can have,
+    # 0x0000 included
+    packet = buildPacket(monkeypatch, 1.5, 0)
+    monkeypatch.setattr(icmpHelperLibrary.time, 'time', lambda: timestamp)
+    seen = set()
+    for sequence in range(0x10000):
+        packet.updatePacket_echoRequest(sequence)
+        checksum = packet.getPacketChecksum()
+        assert checksum == fullChecksum(packet.getPacketBytes()), sequence
+        assert struct.unpack('!H', packet.getPacketBytes()[2:4])[0] == checksum
+        seen.add(checksum)
+    assert 0x0000 in seen
+    # a full computation never gives 0xffff (negative zero), so the incremental one must not either
+    assert 0xffff not in seen
+
+
+@pytest.mark.parametrize('timestamp', TIMESTAMPS, ids=['zero', 'ones', 'mixed'])
+@pytest.mark.parametrize('sequence', [0x0000, 0x0001, 0x7fff, 0xfffe, 0xffff])
+def test_incremental_update_matches_rebuilt_packet(monkeypatch, timestamp, sequence):
+    packet = buildPacket(monkeypatch, 1.5, 0x5555)
+    monkeypatch.setattr(icmpHelperLibrary.time, 'time', lambda: timestamp)
+    packet.updatePacket_echoRequest(sequence)
+
+    rebuilt = buildPacket(monkeypatch, timestamp, sequence)
+    assert packet.getPacketBytes() == rebuilt.getPacketBytes()
+    assert packet.getPacketChecksum() == fullChecksum(rebuilt.getPacketBytes())
@@ -0,0 +1,96 @@
+import heapq
+
+
+# #################################################################################################################### #
+# TimerWheel                                                                                                           #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Hashed timer wheel keyed by iteration. Items are scheduled for a deadline iteration and handed back by advance()     #
+# once the deadline has passed, so each tick only touches the slot for that tick instead of every pending timer.       #
+#                                                                                                                      #
+# Notes:                                                                                                               #
+# There is no cancel. Callers that reschedule or drop an item check whether a returned item is still current (lazy     #
+# cancellation). The pending deadlines are also kept in a min-heap so nextDeadline() can peek at the earliest one;     #
+# advance() and nextDeadline() pop what has fired or is no longer current.                                             #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+
+class TimerWheel(object):
+    def __init__(self, numSlots=64, currentTick=0):
+        self.slots = [[] for _ in range(numSlots)]
+        self.currentTick = currentTick
+        self.count = 0
+        self.deadlines = []         # (deadline, scheduling order, item) heap for nextDeadline()
+        self.countScheduled = 0
+
+    def __len__(self):
+        return self.count
+
+    # ################################################################################################################ #
+    # schedule()                                                                                                       #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Registers item to fire at iteration deadline. Deadlines already reached fire on the next advance().              #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def schedule(self, deadline, item):
+        deadline = max(deadline, self.currentTick + 1)
+        self.slots[deadline % len(self.slots)].append((deadline, item))
+        self.count += 1
+        heapq.heappush(self.deadlines, (deadline, self.countScheduled, item))
+        self.countScheduled += 1
+
+    # ################################################################################################################ #
+    # nextDeadline()                                                                                                   #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Earliest pending deadline, or None. With isCurrent, items it rejects are dropped from the peek (they still come  #
+    # back from advance()), so lazily cancelled timers do not count.                                                   #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def nextDeadline(self, isCurrent=None):
+        deadlines = self.deadlines
+        while deadlines:
+            if isCurrent is None or isCurrent(deadlines[0][2]):
+                return deadlines[0][0]
+            heapq.heappop(deadlines)
+        return None
+
+    # ################################################################################################################ #
+    # advance()                                                                                                        #
+    #                                                                                                                  #
+    # Description:                                                                                                     #
+    # Moves the wheel to iteration now and returns the items whose deadline has passed, ordered by deadline and then   #
+    # by scheduling order.                                                                                             #
+    #                                                                                                                  #
+    # ################################################################################################################ #
+    def advance(self, now):
+        if now <= self.currentTick:
+            return []
+
+        numSlots = len(self.slots)
+        # a gap longer than one revolution visits every slot once
+        ticks = range(self.currentTick + 1, min(now, self.currentTick + numSlots) + 1)
+        self.currentTick = now
+        while self.deadlines and self.deadlines[0][0] <= now:
+            heapq.heappop(self.deadlines)
+
+        expired = []
+        for tick in ticks:
+            index = tick % numSlots
+            slot = self.slots[index]
+            if not slot:
+                continue
+            remaining = []
+            for timer in slot:
+                if timer[0] <= now:
+                    expired.append(timer)
+                else:
+                    remaining.append(timer)     # due in a later revolution
+            self.slots[index] = remaining
+
+        self.count -= len(expired)
+        if len(ticks) > 1:
+            expired.sort(key=lambda timer: timer[0])
+        return [item for deadline, item in expired]
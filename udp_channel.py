@@ -0,0 +1,293 @@
+import argparse
+import multiprocessing
+import random
+import socket
+import struct
+import sys
+import time
+
+from rdt_layer import RDTLayer
+from segment import Segment
+from unreliable import UnreliableChannel
+
+# #################################################################################################################### #
+# UDP transport                                                                                                        #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# UdpChannel carries segments between processes as UDP datagrams behind the send(seg) / receive() interface that       #
+# RDTLayer expects from UnreliableChannel, so the same layer runs over a real socket. One UdpChannel is both the send  #
+# and the receive channel of its endpoint.                                                                             #
+#                                                                                                                      #
+# Notes:                                                                                                               #
+# Wire format (network byte order): HEADER, then SACK_BLOCK per selective-ACK range, then the payload (UTF-8 for       #
+# string payloads, raw for binary ones; FLAG_BINARY tells them apart). The checksum travels as computed by the         #
+# sender, so corruption in the impairment shim is still caught by the receiver.                                        #
+# With an impairment channel, outgoing segments pass through an in-process UnreliableChannel (its drop, delay,         #
+# reorder and corruption ratios) before they reach the socket.                                                         #
+#   python udp_channel.py local --size 200000 --loss 0.05                                                              #
+#   python udp_channel.py receive --port 9000 --output out.bin   /   python udp_channel.py send in.bin --port 9000     #
+#                                                                                                                      #
+# #################################################################################################################### #
+
+HEADER = struct.Struct('!BIiiIiiiiiB')  # flags, connection, seq, ack, checksum, start, echo, window, mss, probe, sacks
+SACK_BLOCK = struct.Struct('!ii')
+FLAG_BINARY = 0x01
+FLAG_MSS_REPLY = 0x02
+MAX_DATAGRAM = 65507
+
+
+def encodeSegment(seg):
+    payload = seg.payload
+    flags = 0
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    else:
+        flags |= FLAG_BINARY
+    if seg.isMssReply():
+        flags |= FLAG_MSS_REPLY
+    parts = [HEADER.pack(flags, seg.getConnectionId(), seg.seqnum, seg.acknum, seg.checksum,
+                         seg.getStartIteration(), seg.getEchoIteration(), seg.getWindow(), seg.getMss(), seg.getProbe(),
+                         len(seg.sack))]
+    for start, end in seg.sack:
+        parts.append(SACK_BLOCK.pack(start, end))
+    parts.append(payload)
+    return b''.join(parts)
+
+
+def decodeSegment(datagram):
+    (flags, connectionId, seqnum, acknum, checksum, startIteration, echoIteration, window, mss, probe,
+     sackCount) = HEADER.unpack_from(datagram)
+    offset = HEADER.size
+    sack = []
+    for _ in range(sackCount):
+        sack.append(SACK_BLOCK.unpack_from(datagram, offset))
+        offset += SACK_BLOCK.size
+    payload = datagram[offset:]
+    if not flags & FLAG_BINARY:
+        payload = payload.decode('utf-8')
+
+    seg = Segment()
+    seg.seqnum = seqnum
+    seg.acknum = acknum
+    seg.payload = payload
+    seg.sack = tuple(sack)
+    seg.connectionId = connectionId
+    seg.checksum = checksum
+    seg.setStartIteration(startIteration)
+    seg.setEchoIteration(echoIteration)
+    seg.setWindow(window)
+    seg.setMss(mss, bool(flags & FLAG_MSS_REPLY))
+    seg.setProbe(probe)
+    return seg
+
+
+class UdpChannel(object):
+    def __init__(self, localAddress, remoteAddress=None, impairment=None):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(localAddress)
+        self.socket.setblocking(False)
+        self.remoteAddress = remoteAddress  # learnt from the first datagram when None
+        self.impairment = impairment        # UnreliableChannel applied to outgoing segments, or None
+        self.countSentDatagrams = 0
+        self.countReceivedDatagrams = 0
+        self.countMalformedDatagrams = 0
+
+    def getLocalAddress(self):
+        return self.socket.getsockname()
+
+    def send(self, seg):
+        if self.impairment is not None:
+            self.impairment.send(seg)
+        else:
+            self.transmit(seg)
+
+    def transmit(self, seg):
+        if self.remoteAddress is None:
+            return
+        try:
+            self.socket.sendto(encodeSegment(seg), self.remoteAddress)
+        except (BlockingIOError, ConnectionRefusedError):
+            return      # full socket buffer or no listener yet: the datagram is lost like any other
+        self.countSentDatagrams += 1
+
+    def receive(self):
+        segments = []
+        while True:
+            try:
+                datagram, address = self.socket.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, ConnectionRefusedError):
+                break
+            if self.remoteAddress is None:
+                self.remoteAddress = address
+            try:
+                segments.append(decodeSegment(datagram))
+            except (struct.error, UnicodeDecodeError):
+                self.countMalformedDatagrams += 1
+                continue
+            self.countReceivedDatagrams += 1
+        return segments
+
+    # Called once per iteration like UnreliableChannel.processData(); moves segments through the impairment shim
+    def processData(self):
+        if self.impairment is None:
+            return
+        self.impairment.processData()
+        for seg in self.impairment.receive():
+            self.transmit(seg)
+
+    def close(self):
+        self.socket.close()
+
+
+def createImpairment(loss, delay, reorder, corruption, seed=None):
+    if not (loss or delay or reorder or corruption):
+        return None
+    impairment = UnreliableChannel(reorder > 0, loss > 0, delay > 0, corruption > 0, random.Random(seed))
+    impairment.setRatioDroppedPackets(loss)
+    impairment.setRatioDelayedPackets(delay)
+    impairment.setRatioOutOfOrderPackets(reorder)
+    impairment.setRatioDataErrorPackets(corruption)
+    return impairment
+
+
+# #################################################################################################################### #
+# runEndpoint()                                                                                                        #
+#                                                                                                                      #
+# Description:                                                                                                         #
+# Drives an RDTLayer over a UdpChannel in real time, one iteration per tick seconds (as fast as possible for 0),       #
+# until isDone() or until idleTimeout seconds pass without a datagram. Returns the elapsed seconds.                    #
+#                                                                                                                      #
+# #################################################################################################################### #
+def runEndpoint(layer, channel, tick, isDone, idleTimeout):
+    start = time.perf_counter()
+    nextTick = start
+    lastActivity = start
+    received = 0
+    while not isDone():
+        layer.processData()
+        channel.processData()
+
+        now = time.perf_counter()
+        if channel.countReceivedDatagrams != received:
+            received = channel.countReceivedDatagrams
+            lastActivity = now
+        elif now - lastActivity > idleTimeout:
+            break
+        nextTick += tick
+        if nextTick > now:
+            time.sleep(nextTick - now)
+        else:
+            nextTick = now
+    return time.perf_counter() - start
+
+
+def createLayer(mss, window, channel=None):
+    layer = RDTLayer()
+    layer.setVerbose(False)
+    layer.setMaxSegmentSize(mss)
+    layer.setReceiveBufferSize(window)
+    if channel is not None:
+        layer.setSendChannel(channel)
+        layer.setReceiveChannel(channel)
+    return layer
+
+
+def isSendComplete(layer):
+    return layer.nextSeqSend >= len(layer.dataToSend) and not layer.sendWindow
+
+
+def sendData(data, localAddress, remoteAddress, args):
+    impairment = createImpairment(args.loss, args.delay, args.reorder, args.corruption, args.seed)
+    channel = UdpChannel(localAddress, remoteAddress, impairment)
+    layer = createLayer(args.mss, args.window, channel)
+    layer.setDataToSend(data)
+    elapsed = runEndpoint(layer, channel, args.tick, lambda: isSendComplete(layer), args.idle_timeout)
+    channel.close()
+
+    srtt = layer.rttEstimator.srtt
+    print("Sent {0} bytes in {1:.3f} s ({2:.1f} KB/s), {3} iterations".format(
+        len(data), elapsed, len(data) / max(elapsed, 1e-9) / 1024, layer.currentIteration))
+    print("Datagrams sent: {0}, timeouts: {1}, fast retransmits: {2}".format(
+        channel.countSentDatagrams, layer.countSegmentTimeouts, layer.countFastRetransmits))
+    if srtt is not None:
+        print("Smoothed RTT: {0:.2f} iterations ({1:.3f} ms)".format(
+            srtt, srtt * elapsed / max(layer.currentIteration, 1) * 1000))
+    return isSendComplete(layer)
+
+
+def receiveData(localAddress, args, expectedLength=None, ready=None):
+    impairment = createImpairment(args.loss, args.delay, args.reorder, args.corruption,
+                                  None if args.seed is None else args.seed + 1)
+    channel = UdpChannel(localAddress, None, impairment)
+    layer = createLayer(args.mss, args.window, channel)
+    if ready is not None:
+        ready.put(channel.getLocalAddress())
+
+    if expectedLength is None:
+        isDone = lambda: False
+    else:
+        isDone = lambda: len(layer.dataReceived) >= expectedLength
+    # the receiver only knows the transfer is over once the sender goes quiet
+    runEndpoint(layer, channel, args.tick, isDone, args.idle_timeout)
+    # linger so the final ACK reaches the sender even if it is lost once
+    runEndpoint(layer, channel, args.tick, lambda: False, min(args.idle_timeout, 0.5))
+    channel.close()
+    return bytes(layer.dataReceived) if not isinstance(layer.dataReceived, str) else layer.dataReceived
+
+
+def receiveProcess(localAddress, args, expectedLength, ready, results):
+    results.put(receiveData(localAddress, args, expectedLength, ready))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RDT over UDP")
+    parser.add_argument('mode', choices=['send', 'receive', 'local'])
+    parser.add_argument('file', nargs='?', help="file to send (send mode)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000, help="receiver port")
+    parser.add_argument('--output', help="where the receiver stores the data")
+    parser.add_argument('--size', type=int, default=100000, help="random bytes sent in local mode")
+    parser.add_argument('--mss', type=int, default=1024)
+    parser.add_argument('--window', type=int, default=65536)
+    parser.add_argument('--tick', type=float, default=0.0005, help="seconds per iteration")
+    parser.add_argument('--idle-timeout', type=float, default=2.0)
+    parser.add_argument('--loss', type=float, default=0.0)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--reorder', type=float, default=0.0)
+    parser.add_argument('--corruption', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None, help="seed of the impairment shims")
+    args = parser.parse_args(argv)
+
+    if args.mode == 'receive':
+        data = receiveData((args.host, args.port), args)
+        print("Received {0} bytes".format(len(data)))
+        if args.output:
+            with open(args.output, 'wb') as outputFile:
+                outputFile.write(data if isinstance(data, bytes) else data.encode('utf-8'))
+        return
+
+    if args.mode == 'send':
+        if not args.file:
+            parser.error("send needs a file")
+        with open(args.file, 'rb') as payloadFile:
+            data = payloadFile.read()
+        complete = sendData(data, (args.host, 0), (args.host, args.port), args)
+        sys.exit(0 if complete else 1)
+
+    # local: receiver in a child process on an ephemeral port, sender here
+    data = random.Random(args.seed).randbytes(args.size)
+    ready = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    receiver = multiprocessing.Process(target=receiveProcess,
+                                       args=((args.host, 0), args, len(data), ready, results))
+    receiver.start()
+    receiverAddress = ready.get()
+    sendData(data, (args.host, 0), receiverAddress, args)
+    received = results.get()
+    receiver.join()
+    print("Receiver got {0} bytes, {1}".format(len(received), "match" if received == data else "MISMATCH"))
+    sys.exit(0 if received == data else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,8 @@
 import random
 
+from channel_trace import CORRUPT, DELAY, DROP, LATENCY, REORDER
+from timer_wheel import TimerWheel
+
 
 # #################################################################################################################### #
 # UnreliableChannel                                                                                                    #
@@ -22,15 +25,31 @@ class UnreliableChannel():
     RATIO_DATA_ERROR_PACKETS = 0.1
     RATIO_OUT_OF_ORDER_PACKETS = 0.1
     ITERATIONS_TO_DELAY_PACKETS = 5
+    MAX_PAYLOAD_LENGTH = None           # path MTU: longer payloads are silently dropped, None for no limit
 
-    def __init__(self, canDeliverOutOfOrder_, canDropPackets_, canDelayPackets_, canHaveChecksumErrors_):
+    # rng: a random.Random (or anything with random() and choice()) used for every impairment decision, so a channel
+    # can be seeded independently of the global random module. Defaults to the random module itself.
+    def __init__(self, canDeliverOutOfOrder_, canDropPackets_, canDelayPackets_, canHaveChecksumErrors_, rng=None):
+        self.rng = rng if rng is not None else random
         self.sendQueue = []
         self.receiveQueue = []
-        self.delayedPackets = []
+        self.delayedPackets = TimerWheel()  # delayed segments keyed by release iteration
         self.canDeliverOutOfOrder = canDeliverOutOfOrder_
         self.canDropPackets = canDropPackets_
         self.canDelayPackets = canDelayPackets_
         self.canHaveChecksumErrors = canHaveChecksumErrors_
+        self.maxPayloadLength = UnreliableChannel.MAX_PAYLOAD_LENGTH
+        self.ratioDroppedPackets = UnreliableChannel.RATIO_DROPPED_PACKETS
+        self.ratioDelayedPackets = UnreliableChannel.RATIO_DELAYED_PACKETS
+        self.ratioDataErrorPackets = UnreliableChannel.RATIO_DATA_ERROR_PACKETS
+        self.ratioOutOfOrderPackets = UnreliableChannel.RATIO_OUT_OF_ORDER_PACKETS
+        self.iterationsToDelayPackets = UnreliableChannel.ITERATIONS_TO_DELAY_PACKETS
+        self.lossModel = None               # channel_models.LossModel replacing the drop ratio, None for the ratio
+        self.linkModel = None               # channel_models.LinkModel (bandwidth cap and queue), None for unlimited
+        self.delayModel = None              # channel_models.DelayModel giving every segment a latency, None for none
+        self.traceRecorder = None           # channel_trace.TraceRecorder logging every decision
+        self.traceReplayer = None           # channel_trace.TraceReplayer forcing recorded decisions
+        self.tracing = False
         # stats
         self.countTotalDataPackets = 0
         self.countSentPackets = 0
@@ -39,8 +58,56 @@ class UnreliableChannel():
         self.countDelayedPackets = 0
         self.countOutOfOrderPackets = 0
         self.countAckPackets = 0
+        self.countOversizedPackets = 0
+        self.countQueueDroppedPackets = 0
         self.currentIteration = 0
 
+    def setMaxPayloadLength(self, length):
+        self.maxPayloadLength = length
+
+    def setRatioDroppedPackets(self, ratio):
+        self.ratioDroppedPackets = ratio
+
+    def setRatioDelayedPackets(self, ratio):
+        self.ratioDelayedPackets = ratio
+
+    def setRatioDataErrorPackets(self, ratio):
+        self.ratioDataErrorPackets = ratio
+
+    def setRatioOutOfOrderPackets(self, ratio):
+        self.ratioOutOfOrderPackets = ratio
+
+    def setIterationsToDelayPackets(self, iterations):
+        self.iterationsToDelayPackets = iterations
+
+    def setLossModel(self, model):
+        self.lossModel = model
+
+    def setLinkModel(self, model):
+        self.linkModel = model
+
+    def setDelayModel(self, model):
+        self.delayModel = model
+
+    def setTraceRecorder(self, recorder):
+        self.traceRecorder = recorder
+        self.tracing = self.traceRecorder is not None or self.traceReplayer is not None
+
+    def setTraceReplayer(self, replayer):
+        self.traceReplayer = replayer
+        self.tracing = self.traceRecorder is not None or self.traceReplayer is not None
+
+    # Records a decision, or replaces it with the recorded one when replaying a trace. The channel still makes its
+    # own draw first, so its rng stays in step with the recorded run.
+    def traceDecision(self, kind, outcome, seg):
+        if self.traceReplayer is not None:
+            replayed = self.traceReplayer.nextOutcome(kind)
+            if replayed is not None:
+                outcome = replayed if kind == LATENCY else bool(replayed)
+        if self.traceRecorder is not None:
+            self.traceRecorder.record(self.currentIteration, kind, seg, outcome)
+        return outcome
+
     def send(self,seg):
         self.sendQueue.append(seg)
 
@@ -54,60 +121,78 @@ class UnreliableChannel():
         #print("UnreliableChannel manage - len sendQueue: {0}".format(len(self.sendQueue)))
         self.currentIteration += 1
 
-        if len(self.sendQueue) == 0:
+        # link and delay models hold segments across iterations, so the channel then runs every iteration
+        if len(self.sendQueue) == 0 and self.linkModel is None and self.delayModel is None:
             return
 
-        if self.canDeliverOutOfOrder:
-            val = random.random()
-            if val <= UnreliableChannel.RATIO_OUT_OF_ORDER_PACKETS:
+        transmitted = self.transmitSendQueue()
+
+        if self.canDeliverOutOfOrder and transmitted:
+            val = self.rng.random()
+            reorder = val <= self.ratioOutOfOrderPackets
+            if self.tracing:
+                reorder = self.traceDecision(REORDER, reorder, None)
+            if reorder:
                 self.countOutOfOrderPackets += 1
-                self.sendQueue.reverse()
+                transmitted.reverse()
 
         # add in delayed packets
-        noLongerDelayed = []
-        for seg in self.delayedPackets:
-            numIterDelayed = self.currentIteration - seg.getStartDelayIteration()
-            if (numIterDelayed) >= UnreliableChannel.ITERATIONS_TO_DELAY_PACKETS:
-                noLongerDelayed.append(seg)
-
-        for seg in noLongerDelayed:
+        for seg in self.delayedPackets.advance(self.currentIteration):
             self.countSentPackets += 1
-            self.delayedPackets.remove(seg)
             self.receiveQueue.append(seg)
 
-        for seg in self.sendQueue:
+        for seg in transmitted:
             #self.receiveQueue.append(seg)
 
-            addToReceiveQueue = False
+            if self.maxPayloadLength is not None and len(seg.payload) > self.maxPayloadLength:
+                self.countOversizedPackets += 1
+                continue
+
             if self.canDelayPackets:
-                val = random.random()
-                if val <= UnreliableChannel.RATIO_DELAYED_PACKETS:
+                val = self.rng.random()
+                delayed = val <= self.ratioDelayedPackets
+                if self.tracing:
+                    delayed = self.traceDecision(DELAY, delayed, seg)
+                if delayed:
                     self.countDelayedPackets += 1
                     seg.setStartDelayIteration(self.currentIteration)
-                    self.delayedPackets.append(seg)
+                    if self.delayModel is None:
+                        self.delayedPackets.schedule(self.currentIteration + self.iterationsToDelayPackets, seg)
+                    else:
+                        # the extra delay comes on top of the path's latency, not instead of it
+                        self.propagate(seg, self.iterationsToDelayPackets)
                     continue
 
-            if self.canDropPackets:
-                val = random.random()
-                if val <= UnreliableChannel.RATIO_DROPPED_PACKETS:
-                    self.countDroppedPackets += 1
-                else:
-                    addToReceiveQueue = True
+            if self.lossModel is not None:
+                lost = self.lossModel.isLost(self.rng)
+            elif self.canDropPackets:
+                val = self.rng.random()
+                lost = val <= self.ratioDroppedPackets
             else:
-                addToReceiveQueue = True
+                lost = False
+            if self.tracing:
+                lost = self.traceDecision(DROP, lost, seg)
 
-            if addToReceiveQueue:
+            if lost:
+                self.countDroppedPackets += 1
+            elif self.delayModel is None:
                 self.receiveQueue.append(seg)
                 self.countSentPackets += 1
+            else:
+                self.propagate(seg)
 
-            if seg.acknum == -1:
+            # segments with a payload are data packets, even when they piggyback an acknowledgment
+            if seg.payload:
                 self.countTotalDataPackets += 1
 
                 # only data packets can have checksum errors...
                 if self.canHaveChecksumErrors:
-                    val = random.random()
-                    if val <= UnreliableChannel.RATIO_DATA_ERROR_PACKETS:
-                        seg.createChecksumError()
+                    val = self.rng.random()
+                    corrupt = val <= self.ratioDataErrorPackets
+                    if self.tracing:
+                        corrupt = self.traceDecision(CORRUPT, corrupt, seg)
+                    if corrupt:
+                        seg.createChecksumError(self.rng)
                         self.countChecksumErrorPackets += 1
 
             else:
@@ -118,3 +203,26 @@ class UnreliableChannel():
 
         self.sendQueue.clear()
         #print("UnreliableChannel manage - len receiveQueue: {0}".format(len(self.receiveQueue)))
+
+    # Returns the segments that go out on the link this iteration: the whole sendQueue, or with a link model the
+    # ones its bandwidth allows, after queueing the new ones (drop-tail when the queue is full)
+    def transmitSendQueue(self):
+        if self.linkModel is None:
+            return self.sendQueue
+        for seg in self.sendQueue:
+            if not self.linkModel.enqueue(seg):
+                self.countQueueDroppedPackets += 1
+        self.sendQueue.clear()
+        return self.linkModel.dequeue()
+
+    # Delivers seg after the delay model's latency plus extraDelay iterations
+    def propagate(self, seg, extraDelay=0):
+        delay = self.delayModel.getDelay(self.rng)
+        if self.tracing:
+            delay = self.traceDecision(LATENCY, delay, seg)
+        delay += extraDelay
+        if delay > 0:
+            self.delayedPackets.schedule(self.currentIteration + delay, seg)
+        else:
+            self.receiveQueue.append(seg)
+            self.countSentPackets += 1